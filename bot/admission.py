@@ -0,0 +1,157 @@
+# bot/admission.py
+"""
+Допуск резюме к обработке.
+
+Перед конвейером разбора PDF стоит ограниченная очередь: одновременно
+обрабатывается не больше MAX_CONCURRENT_RESUMES файлов и не больше
+MAX_RESUMES_PER_USER от одного пользователя, а в ожидании может стоять
+не больше MAX_QUEUED_RESUMES. Слишком большие файлы отклоняются до скачивания.
+Когда очередь заполнена, новые загрузки сразу получают отказ, а не копят память.
+"""
+import asyncio
+import logging
+from collections import defaultdict, deque
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+MAX_RESUME_SIZE = 5 * 1024 * 1024
+MAX_CONCURRENT_RESUMES = 4
+MAX_RESUMES_PER_USER = 1
+MAX_QUEUED_RESUMES = 50
+# Позицию в очереди сообщаем не на каждом шаге, чтобы не упираться в лимиты Telegram
+POSITION_NOTIFY_FIRST = 5
+POSITION_NOTIFY_EVERY = 5
+
+PositionCallback = Callable[[int], Awaitable[None]]
+
+
+class AdmissionRejected(Exception):
+    """
+    Резюме не принято к обработке; текст исключения можно показать пользователю
+    """
+
+
+class _Ticket:
+    __slots__ = ("user_id", "future", "on_position", "position", "notify_task")
+
+    def __init__(self, user_id: int, on_position: Optional[PositionCallback]):
+        self.user_id = user_id
+        self.future = asyncio.get_running_loop().create_future()
+        self.on_position = on_position
+        self.position = 0
+        self.notify_task: Optional[asyncio.Task] = None
+
+    def cancel_notify(self) -> None:
+        if self.notify_task is not None and not self.notify_task.done():
+            self.notify_task.cancel()
+
+
+class ResumeAdmission:
+    def __init__(self, max_concurrent: int = MAX_CONCURRENT_RESUMES,
+                 max_per_user: int = MAX_RESUMES_PER_USER,
+                 max_queued: int = MAX_QUEUED_RESUMES,
+                 max_file_size: int = MAX_RESUME_SIZE):
+        self.max_concurrent = max_concurrent
+        self.max_per_user = max_per_user
+        self.max_queued = max_queued
+        self.max_file_size = max_file_size
+        self.active = 0
+        self._per_user = defaultdict(int)
+        self._waiting = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiting)
+
+    def check_file_size(self, file_size: Optional[int]) -> None:
+        if file_size and file_size > self.max_file_size:
+            raise AdmissionRejected(
+                f"❌ Файл слишком большой ({file_size // 1024} КБ). "
+                f"Максимальный размер резюме — {self.max_file_size // 1024 // 1024} МБ."
+            )
+
+    async def acquire(self, user_id: int, on_position: Optional[PositionCallback] = None) -> None:
+        if self._per_user.get(user_id, 0) >= self.max_per_user:
+            raise AdmissionRejected("⏳ Ваше предыдущее резюме ещё обрабатывается. Дождитесь результата.")
+        if self.active < self.max_concurrent and not self._waiting:
+            self._per_user[user_id] += 1
+            self.active += 1
+            return
+        if len(self._waiting) >= self.max_queued:
+            logger.warning("Очередь резюме переполнена (%s), отказ пользователю %s", len(self._waiting), user_id)
+            raise AdmissionRejected("🚦 Сейчас слишком много резюме в обработке. Попробуйте через минуту.")
+        self._per_user[user_id] += 1
+        ticket = _Ticket(user_id, on_position)
+        self._waiting.append(ticket)
+        self._notify_positions()
+        try:
+            await ticket.future
+            # Устаревшее "Ваша позиция: N" не должно прийти после того,
+            # как вызывающий код начнёт обновлять сообщение сам
+            if ticket.notify_task is not None:
+                await asyncio.wait({ticket.notify_task})
+        except asyncio.CancelledError:
+            ticket.cancel_notify()
+            if ticket in self._waiting:
+                self._waiting.remove(ticket)
+                self._notify_positions()
+            elif ticket.future.done() and not ticket.future.cancelled():
+                # Слот уже был передан этой заявке — отдаём его следующей
+                self._release_slot()
+            self._forget_user(user_id)
+            raise
+
+    def release(self, user_id: int) -> None:
+        self._forget_user(user_id)
+        self._release_slot()
+
+    def _release_slot(self) -> None:
+        self.active -= 1
+        while self._waiting:
+            ticket = self._waiting.popleft()
+            if ticket.future.done():
+                continue
+            # Слот переходит следующей заявке напрямую, active не меняется
+            self.active += 1
+            ticket.cancel_notify()
+            ticket.future.set_result(None)
+            break
+        self._notify_positions()
+
+    def _forget_user(self, user_id: int) -> None:
+        self._per_user[user_id] -= 1
+        if self._per_user[user_id] <= 0:
+            del self._per_user[user_id]
+
+    def _notify_positions(self) -> None:
+        for position, ticket in enumerate(self._waiting, start=1):
+            if ticket.position == position:
+                continue
+            first = ticket.position == 0
+            ticket.position = position
+            if ticket.on_position is None:
+                continue
+            if first or position <= POSITION_NOTIFY_FIRST or position % POSITION_NOTIFY_EVERY == 0:
+                # Новая позиция важнее недоставленной старой
+                ticket.cancel_notify()
+                ticket.notify_task = asyncio.create_task(self._safe_notify(ticket.on_position, position))
+
+    @staticmethod
+    async def _safe_notify(callback: PositionCallback, position: int) -> None:
+        try:
+            await callback(position)
+        except Exception as e:
+            logger.error("Ошибка при обновлении позиции в очереди: %s", e)
+
+    @asynccontextmanager
+    async def slot(self, user_id: int, on_position: Optional[PositionCallback] = None):
+        await self.acquire(user_id, on_position)
+        try:
+            yield
+        finally:
+            self.release(user_id)
+
+
+resume_admission = ResumeAdmission()
@@ -1,7 +1,10 @@
 # bot/handlers/callbacks.py
+import datetime
+
 from aiogram import Router, F
 from aiogram.types import CallbackQuery
 from bot.keyboard import get_main_menu_keyboard
+from core.stats import usage_stats
 
 router = Router()
 
@@ -24,15 +27,44 @@ async def upload_resume_callback(callback: CallbackQuery) -> None:
         reply_markup=get_main_menu_keyboard()
     )
 
+def format_statistics(snapshot: dict, detailed: bool = False) -> str:
+    """
+    Текст статистики из готового снимка core.stats.usage_stats.snapshot
+    """
+    counters = snapshot.get("counters", {})
+    text = (
+        "📊 Статистика использования бота:\n\n"
+        f"• Обработано резюме: {counters.get('resumes_processed', 0)}\n"
+        f"• Извлечено навыков: {counters.get('skills_extracted', 0)}\n"
+        f"• Поисков вакансий: {counters.get('searches', 0)}\n"
+        f"• Показано вакансий: {counters.get('vacancies_shown', 0)}\n"
+    )
+    top_skills = snapshot.get("top_skills") or []
+    if top_skills:
+        text += "\n🔥 Популярные навыки: " + ", ".join(skill for skill, _ in top_skills[:5]) + "\n"
+    if detailed:
+        text += f"\n• Отклонено резюме: {counters.get('resumes_rejected', 0)}\n"
+        latency = snapshot.get("latency_ms") or {}
+        if latency:
+            text += "\n⏱ Задержки (мс):\n"
+            for stage, values in sorted(latency.items()):
+                text += (
+                    f"• {stage}: n={values['count']}, avg={values['avg']:.0f}, "
+                    f"p50≤{values['p50']:.0f}, p95≤{values['p95']:.0f}, max={values['max']:.0f}\n"
+                )
+        if top_skills:
+            text += "\n🔥 Топ навыков (приблизительно):\n"
+            text += "\n".join(f"• {skill}: {count}" for skill, count in top_skills) + "\n"
+    updated_at = snapshot.get("updated_at")
+    if updated_at:
+        text += "\n🕒 Обновлено: " + datetime.datetime.fromtimestamp(updated_at).strftime("%d.%m.%Y %H:%M:%S")
+    return text
+
 @router.callback_query(F.data == "statistics")
 async def statistics_callback(callback: CallbackQuery) -> None:
     await callback.answer("📊 Статистика")
     await callback.message.edit_text(
-        "📊 Статистика использования бота:\n\n"
-        "• Обработано резюме: 0\n"
-        "• Найдено вакансий: 0\n"
-        "• Успешных трудоустройств: 0\n\n"
-        "Функция находится в разработке!",
+        format_statistics(usage_stats.snapshot),
         reply_markup=get_main_menu_keyboard()
     )
 
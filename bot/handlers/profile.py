@@ -0,0 +1,92 @@
+# bot/handlers/profile.py
+import logging
+
+from aiogram import Bot, Router, F
+from aiogram.filters import Command, StateFilter
+from aiogram.fsm.context import FSMContext
+from aiogram.types import BufferedInputFile, CallbackQuery, Message
+
+from bot.handlers.resume import ResumeStates, restore_profile, save_profile, send_hh_vacancies
+from bot.keyboard import format_skills_list, get_skills_keyboard
+from core import ranker
+from core.profiles import ProfileError, export_profile, import_profile, profile_store
+
+logger = logging.getLogger(__name__)
+
+router = Router()
+
+# Размер импортируемого файла профиля
+MAX_PROFILE_FILE_SIZE = 64 * 1024
+
+
+@router.callback_query(F.data == "search_jobs", ~StateFilter(ResumeStates.editing_skills))
+async def search_jobs_from_profile_handler(callback: CallbackQuery, state: FSMContext) -> None:
+    """
+    'Найти вакансии' вне режима редактирования (главное меню, старые сообщения):
+    навыки берутся из сохранённого профиля, резюме загружать заново не нужно
+    """
+    skills = await restore_profile(state, callback.from_user.id)
+    if not skills:
+        await callback.answer("Сначала загрузите резюме в PDF", show_alert=True)
+        return
+    await callback.answer("Ищу вакансии на hh.ru по вашим навыкам...", show_alert=False)
+    await send_hh_vacancies(callback.message, state, page=0)
+    await save_profile(state, callback.from_user)
+
+
+@router.message(Command("export_profile"))
+async def export_profile_handler(message: Message, state: FSMContext) -> None:
+    if not message.from_user:
+        return
+    skills = await restore_profile(state, message.from_user.id)
+    if not skills:
+        await message.answer("Профиль пока пуст — загрузите резюме в PDF.")
+        return
+    await save_profile(state, message.from_user)
+    profile = await profile_store.get(message.from_user.id)
+    await message.answer_document(
+        BufferedInputFile(export_profile(profile), filename="profile.json"),
+        caption="📦 Ваш профиль. Отправьте этот файл боту, чтобы восстановить навыки.",
+    )
+
+
+@router.message(Command("forget_profile"))
+async def forget_profile_handler(message: Message, state: FSMContext) -> None:
+    if not message.from_user:
+        return
+    await profile_store.delete(message.from_user.id)
+    await state.clear()
+    await message.answer("🗑 Сохранённый профиль удалён.")
+
+
+@router.message(F.document.file_name.endswith(".json"))
+async def import_profile_handler(message: Message, bot: Bot, state: FSMContext) -> None:
+    if not message.from_user:
+        return
+    if (message.document.file_size or 0) > MAX_PROFILE_FILE_SIZE:
+        await message.answer("❌ Файл профиля слишком большой.")
+        return
+    try:
+        raw = await bot.download(message.document)
+        profile = import_profile(raw.read())
+    except ProfileError as e:
+        await message.answer(f"❌ Не удалось импортировать профиль: {e}")
+        return
+    except Exception as e:
+        logger.error("Ошибка при загрузке файла профиля: %s", e)
+        await message.answer("❌ Не удалось загрузить файл. Попробуйте ещё раз.")
+        return
+    profile_store.remember(message.from_user.id, profile)
+    sort = profile["filters"].get("sort")
+    await state.set_data({
+        "user_skills": profile["skills"],
+        "hh_sort": sort if sort in ranker.SORT_MODES else ranker.DEFAULT_SORT_MODE,
+        "hh_prev_results": profile["last_results"],
+        "profile_updated_at": profile["updated_at"],
+    })
+    await state.set_state(ResumeStates.editing_skills)
+    await message.answer(
+        "✅ Профиль импортирован.\n\n" + format_skills_list(profile["skills"]),
+        parse_mode="HTML",
+        reply_markup=get_skills_keyboard(profile["skills"]),
+    )
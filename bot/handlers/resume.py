@@ -1,20 +1,34 @@
 # bot/handlers/resume.py
 
+import asyncio
 import uuid
 import logging
 from pathlib import Path
 import datetime
+import time
+from typing import List, Optional
 
-from aiogram import Router, F
-from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
+from aiogram import Bot, Router, F
+from aiogram.types import Message
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram import types
-import httpx
 from aiogram.exceptions import TelegramBadRequest
 
-# Настраиваем логирование
-logging.basicConfig(level=logging.INFO)
+from bot.admission import AdmissionRejected, resume_admission
+from bot.keyboard import (
+    format_skills_list,
+    get_del_skill_keyboard,
+    get_skills_keyboard,
+    get_vacancies_keyboard,
+    resolve_skill_callback,
+)
+from core import dedup, profiles, ranker
+from core.profiles import profile_store
+from core.stats import usage_stats
+from core.fetchers import hh
+
+# Логирование настраивается в bot/main.py (core.log.setup_logging)
 logger = logging.getLogger(__name__)
 
 router = Router()
@@ -35,10 +49,10 @@ async def resume_handler(message: Message, bot: Bot, state: FSMContext) -> None:
     Принимает PDF-файл, сохраняет его во временную папку,
     парсит и извлекает ключевые навыки.
     """
-    logger.info("=" * 50)
-    logger.info("НАЧАЛО ОБРАБОТКИ РЕЗЮМЕ (PDF)")
-    logger.info(f"От пользователя: {message.from_user.id if message.from_user else 'Unknown'}")
-    logger.info(f"Имя файла: {message.document.file_name if message.document else 'None'}")
+    logger.debug("=" * 50)
+    logger.debug("НАЧАЛО ОБРАБОТКИ РЕЗЮМЕ (PDF)")
+    logger.debug("От пользователя: %s", message.from_user.id if message.from_user else 'Unknown')
+    logger.debug("Имя файла: %s", message.document.file_name if message.document else 'None')
     
     await process_resume(message, bot, state)
 
@@ -48,11 +62,11 @@ async def any_document_handler(message: Message, bot: Bot, state: FSMContext) ->
     """
     Обработчик для всех документов - проверяет, является ли PDF
     """
-    logger.info("=" * 50)
-    logger.info("ОБРАБОТЧИК ВСЕХ ДОКУМЕНТОВ")
-    logger.info(f"От пользователя: {message.from_user.id if message.from_user else 'Unknown'}")
-    logger.info(f"Имя файла: {message.document.file_name if message.document else 'None'}")
-    logger.info(f"MIME тип: {message.document.mime_type if message.document else 'None'}")
+    logger.debug("=" * 50)
+    logger.debug("ОБРАБОТЧИК ВСЕХ ДОКУМЕНТОВ")
+    logger.debug("От пользователя: %s", message.from_user.id if message.from_user else 'Unknown')
+    logger.debug("Имя файла: %s", message.document.file_name if message.document else 'None')
+    logger.debug("MIME тип: %s", message.document.mime_type if message.document else 'None')
     
     if not message.document:
         await message.answer("❌ Не удалось получить документ.")
@@ -60,10 +74,10 @@ async def any_document_handler(message: Message, bot: Bot, state: FSMContext) ->
     
     # Проверяем, является ли файл PDF
     if message.document.mime_type == "application/pdf":
-        logger.info("✅ Это PDF файл, обрабатываю как резюме")
+        logger.debug("✅ Это PDF файл, обрабатываю как резюме")
         await process_resume(message, bot, state)
     else:
-        logger.info(f"❌ Не PDF файл: {message.document.mime_type}")
+        logger.info("❌ Не PDF файл: %s", message.document.mime_type)
         await message.answer(
             "❌ Пожалуйста, отправьте файл в формате PDF.\n\n"
             f"Получен файл типа: {message.document.mime_type}"
@@ -79,34 +93,69 @@ async def process_resume(message: Message, bot: Bot, state: FSMContext) -> None:
         await message.answer("❌ Не удалось получить документ.")
         return
     
-    logger.info(f"Получен PDF документ: {message.document.file_name}")
+    logger.debug("Получен PDF документ: %s", message.document.file_name)
+
+    # Слишком большой файл отклоняем до скачивания
+    try:
+        resume_admission.check_file_size(message.document.file_size)
+    except AdmissionRejected as e:
+        usage_stats.incr("resumes_rejected")
+        logger.warning("Файл отклонён по размеру: %s байт", message.document.file_size)
+        await message.answer(str(e))
+        return
     
     # Отправляем сообщение о начале обработки
     try:
         processing_msg = await message.answer(
             "📄 Резюме получено! Начинаю обработку..."
         )
-        logger.info("✅ Отправлено сообщение о начале обработки")
+        logger.debug("✅ Отправлено сообщение о начале обработки")
     except Exception as e:
-        logger.error(f"❌ Ошибка при отправке первого сообщения: {e}")
+        logger.error("❌ Ошибка при отправке первого сообщения: %s", e)
         return
-        
+
+    user_id = message.from_user.id if message.from_user else message.chat.id
+
+    async def report_queue_position(position: int) -> None:
+        await processing_msg.edit_text(
+            f"⏳ Резюме в очереди на обработку. Ваша позиция: {position}"
+        )
+
+    started = time.perf_counter()
+    try:
+        async with resume_admission.slot(user_id, on_position=report_queue_position):
+            usage_stats.observe("resume_queue", time.perf_counter() - started)
+            await process_admitted_resume(message, bot, state, processing_msg)
+        usage_stats.observe("resume_total", time.perf_counter() - started)
+    except AdmissionRejected as e:
+        usage_stats.incr("resumes_rejected")
+        logger.warning("Резюме от %s не принято: %s", user_id, e)
+        try:
+            await processing_msg.edit_text(str(e))
+        except Exception as edit_error:
+            logger.error("❌ Ошибка при отправке отказа: %s", edit_error)
+
+
+async def process_admitted_resume(message: Message, bot: Bot, state: FSMContext, processing_msg: Message) -> None:
+    """
+    Скачивание и разбор резюме; вызывается, когда резюме получило слот обработки
+    """
     # Генерируем уникальное имя, чтобы не было коллизий
     tmp_path = TMP_DIR / f"{uuid.uuid4()}.pdf"
-    logger.info(f"Временный путь: {tmp_path}")
+    logger.debug("Временный путь: %s", tmp_path)
     
     try:
         # Сохраняем PDF в tmp/
-        logger.info("Начинаю загрузку PDF файла...")
+        logger.debug("Начинаю загрузку PDF файла...")
         await bot.download(message.document, destination=tmp_path)
-        logger.info("✅ PDF файл успешно загружен")
+        logger.debug("✅ PDF файл успешно загружен")
         
         # Проверяем, что файл существует и не пустой
         if not tmp_path.exists():
             raise FileNotFoundError("Файл не был сохранен")
         
         file_size = tmp_path.stat().st_size
-        logger.info(f"Размер файла: {file_size} байт")
+        logger.debug("Размер файла: %s байт", file_size)
         
         if file_size == 0:
             raise ValueError("Файл пустой")
@@ -116,45 +165,51 @@ async def process_resume(message: Message, bot: Bot, state: FSMContext) -> None:
             await processing_msg.edit_text(
                 "📄 Резюме сохранено! Извлекаю ключевые навыки..."
             )
-            logger.info("✅ Обновлено сообщение о сохранении")
+            logger.debug("✅ Обновлено сообщение о сохранении")
         except Exception as e:
-            logger.error(f"❌ Ошибка при обновлении сообщения: {e}")
+            logger.error("❌ Ошибка при обновлении сообщения: %s", e)
         
-        logger.info("Начинаю извлечение навыков...")
+        logger.debug("Начинаю извлечение навыков...")
         
         # Пробуем импортировать и использовать skills_extractor
         try:
-            logger.info("Импортирую skills_extractor...")
+            logger.debug("Импортирую skills_extractor...")
             from core.skills_extractor import skills_extractor
-            logger.info("✅ Модуль skills_extractor успешно импортирован")
+            logger.debug("✅ Модуль skills_extractor успешно импортирован")
             
             # Извлекаем навыки из PDF
-            logger.info("Вызываю extract_skills_from_pdf...")
-            skills_result = skills_extractor.extract_skills_from_pdf(str(tmp_path))
-            logger.info(f"✅ Навыки извлечены: {len(skills_result) if skills_result else 0} источников")
+            logger.debug("Вызываю extract_skills_from_pdf...")
+            # Разбор PDF блокирует процессор, поэтому выполняется в отдельном потоке
+            parse_started = time.perf_counter()
+            skills_result = await asyncio.to_thread(skills_extractor.extract_skills_from_pdf, str(tmp_path))
+            usage_stats.observe("resume_parse", time.perf_counter() - parse_started)
+            logger.debug("✅ Навыки извлечены: %s источников", len(skills_result) if skills_result else 0)
 
             # Логируем результат анализа
-            logger.info(f"Результат skills_extractor: {skills_result}")
+            logger.debug("Результат skills_extractor: %s", skills_result)
 
             skills_set = set()
             # Если есть ключи skillner/keybert/dict — старый формат
             if any(k in skills_result for k in ("skillner", "keybert", "dict")):
                 for key in ("skillner", "keybert"):
-                    logger.info(f"Навыки из {key}: {skills_result.get(key, [])}")
+                    logger.debug("Навыки из %s: %s", key, skills_result.get(key, []))
                     skills_set.update(skills_result.get(key, []))
                 dict_skills = skills_result.get("dict", {})
-                logger.info(f"Навыки из dict: {dict_skills}")
+                logger.debug("Навыки из dict: %s", dict_skills)
                 if isinstance(dict_skills, dict):
                     for cat_skills in dict_skills.values():
                         skills_set.update(cat_skills)
             else:
                 # Новый формат: сразу категории
                 for cat, cat_skills in skills_result.items():
-                    logger.info(f"Навыки из {cat}: {cat_skills}")
+                    logger.debug("Навыки из %s: %s", cat, cat_skills)
                     if isinstance(cat_skills, list):
                         skills_set.update(cat_skills)
             skills_list = sorted(skills_set)
-            logger.info(f"Общий итоговый список навыков: {skills_list}")
+            usage_stats.incr("resumes_processed")
+            usage_stats.incr("skills_extracted", len(skills_list))
+            usage_stats.add_skills(skills_list)
+            logger.info("Общий итоговый список навыков: %s", skills_list)
 
             # Fallback: если ничего не найдено, показываем отдельное сообщение
             if not skills_list:
@@ -168,8 +223,9 @@ async def process_resume(message: Message, bot: Bot, state: FSMContext) -> None:
                 await state.set_state(ResumeStates.editing_skills)
                 return
 
-            # Сохраняем навыки в FSM
+            # Сохраняем навыки в FSM и в профиль пользователя
             await state.update_data(user_skills=skills_list)
+            await save_profile(state, message.from_user)
 
             # Формируем сообщение для редактирования
             skills_text = "\n".join(f"• {s}" for s in skills_list) if skills_list else "(ничего не найдено)"
@@ -188,7 +244,7 @@ async def process_resume(message: Message, bot: Bot, state: FSMContext) -> None:
             
             # Формируем ответ
             if skills:
-                logger.info("Формирую ответ с найденными навыками...")
+                logger.debug("Формирую ответ с найденными навыками...")
                 # Получаем все навыки
                 all_skills = skills_extractor.get_top_skills(skills, 1000)  # Получаем все навыки
                 
@@ -221,7 +277,7 @@ async def process_resume(message: Message, bot: Bot, state: FSMContext) -> None:
                     "💡 Теперь я могу подобрать для вас подходящие вакансии на основе этих навыков!"
                 )
                 
-                logger.info(f"Сформирован ответ длиной {len(response_text)} символов")
+                logger.debug("Сформирован ответ длиной %s символов", len(response_text))
                 
             else:
                 logger.warning("Навыки не найдены, формирую ответ об ошибке...")
@@ -234,7 +290,7 @@ async def process_resume(message: Message, bot: Bot, state: FSMContext) -> None:
                 )
             
         except ImportError as e:
-            logger.error(f"❌ Ошибка импорта skills_extractor: {e}")
+            logger.error("❌ Ошибка импорта skills_extractor: %s", e)
             response_text = (
                 "✅ Резюме успешно получено и сохранено!\n\n"
                 "⚠️ Модуль анализа навыков временно недоступен.\n"
@@ -243,23 +299,21 @@ async def process_resume(message: Message, bot: Bot, state: FSMContext) -> None:
             )
         
         # Отправляем результат
-        logger.info("Отправляю результат пользователю...")
+        logger.debug("Отправляю результат пользователю...")
         try:
             await processing_msg.edit_text(response_text)
-            logger.info("✅ Результат успешно отправлен")
+            logger.debug("✅ Результат успешно отправлен")
         except Exception as e:
-            logger.error(f"❌ Ошибка при отправке результата: {e}")
+            logger.error("❌ Ошибка при отправке результата: %s", e)
             # Пробуем отправить новое сообщение
             try:
                 await message.answer(response_text)
-                logger.info("✅ Результат отправлен новым сообщением")
+                logger.debug("✅ Результат отправлен новым сообщением")
             except Exception as e2:
-                logger.error(f"❌ Ошибка при отправке нового сообщения: {e2}")
+                logger.error("❌ Ошибка при отправке нового сообщения: %s", e2)
         
     except Exception as e:
-        logger.error(f"❌ Общая ошибка при обработке резюме: {e}")
-        import traceback
-        logger.error(f"Traceback: {traceback.format_exc()}")
+        logger.error("❌ Общая ошибка при обработке резюме: %s", e, exc_info=True)
         
         error_text = (
             "❌ Произошла ошибка при обработке резюме.\n\n"
@@ -270,105 +324,202 @@ async def process_resume(message: Message, bot: Bot, state: FSMContext) -> None:
         try:
             await processing_msg.edit_text(error_text)
         except Exception as edit_error:
-            logger.error(f"❌ Ошибка при отправке сообщения об ошибке: {edit_error}")
+            logger.error("❌ Ошибка при отправке сообщения об ошибке: %s", edit_error)
             try:
                 await message.answer(error_text)
             except Exception as send_error:
-                logger.error(f"❌ Критическая ошибка отправки: {send_error}")
+                logger.error("❌ Критическая ошибка отправки: %s", send_error)
         
     finally:
         # Удаляем временный файл
         try:
             if tmp_path.exists():
                 tmp_path.unlink()
-                logger.info("✅ Временный файл удален")
+                logger.debug("✅ Временный файл удален")
         except Exception as e:
-            logger.error(f"❌ Ошибка при удалении временного файла: {e}")
+            logger.error("❌ Ошибка при удалении временного файла: %s", e)
     
-    logger.info("КОНЕЦ ОБРАБОТКИ РЕЗЮМЕ")
-    logger.info("=" * 50)
+    logger.debug("КОНЕЦ ОБРАБОТКИ РЕЗЮМЕ")
+    logger.debug("=" * 50)
 
 VACANCIES_PER_PAGE = 5
 VACANCIES_FETCH_LIMIT = 50
+# Для скольких лучших кандидатов загружать полную карточку вакансии
+VACANCIES_ENRICH_TOP_N = 20
+# Сколько секунд загруженная выдача считается актуальной
+VACANCIES_CACHE_TTL = 600
+
+def _skill_key(skill: str) -> str:
+    return skill.lower().strip()
+
+async def rerank_cached_vacancies(state: FSMContext, added=None, removed=None) -> None:
+    """
+    Пересчитывает счёт уже загруженных вакансий после правки списка навыков,
+    чтобы следующий поиск показал новый порядок без запроса к hh.ru.
+    """
+    data = await state.get_data()
+    vacancies = data.get("hh_vacancies")
+    if not vacancies:
+        return
+    if added:
+        texts = [hh.vacancy_cache.search_text(v["id"]) for v in vacancies]
+        if None in texts:
+            # Часть выдачи вытеснена из общего кэша — следующий поиск загрузит её заново
+            await state.update_data(hh_fetched_at=0)
+            texts = [text or "" for text in texts]
+        ranker.add_skill(vacancies, added, texts)
+        # Навык не войдёт в запросы к hh.ru — загруженная выдача его уже покрывает
+        if _skill_key(added) not in {_skill_key(s) for s in hh.select_skills(data.get("user_skills") or [])}:
+            covered = set(data.get("hh_covered_skills") or ())
+            covered.add(_skill_key(added))
+            await state.update_data(hh_covered_skills=sorted(covered))
+    if removed:
+        ranker.remove_skill(vacancies, removed)
+    columns = data["hh_columns"]
+    ranker.refresh_scores(columns, vacancies)
+    order = ranker.order_by(columns, data.get("hh_sort", ranker.DEFAULT_SORT_MODE))
+    await state.update_data(hh_vacancies=vacancies, hh_columns=columns, hh_order=order)
+
+async def save_profile(state: FSMContext, user) -> None:
+    """
+    Запоминает навыки, режим сортировки и последнюю выдачу пользователя.
+    На диск профиль попадает пакетом в фоне (core.profiles).
+    """
+    if user is None:
+        return
+    data = await state.get_data()
+    vacancies = data.get("hh_vacancies") or []
+    order = data.get("hh_order") or []
+    last_results = [vacancies[i].get("id") for i in order[:profiles.LAST_RESULTS_LIMIT]]
+    profile = profiles.make_profile(
+        data.get("user_skills") or [],
+        sort=data.get("hh_sort"),
+        last_results=[r for r in last_results if r],
+    )
+    profile_store.remember(user.id, profile)
+    # По этой отметке restore_profile узнаёт, что FSM отстал от профиля
+    await state.update_data(profile_updated_at=profile["updated_at"])
+
+async def restore_profile(state: FSMContext, user_id: int) -> Optional[List[str]]:
+    """
+    Сверяет FSM с сохранённым профилем и переводит пользователя в режим
+    редактирования навыков. Навыки берутся из профиля, если FSM пуст или
+    профиль новее копии в FSM: например, пользователь вернулся на воркер,
+    где остался его старый FSM, а навыки менял на другом.
+    Возвращает навыки или None, если их нет ни в FSM, ни в профиле.
+    """
+    data = await state.get_data()
+    skills = data.get("user_skills")
+    # Файл общий для воркеров, поэтому читаем его в обход кэша
+    profile = await profile_store.get(user_id, fresh=True)
+    if profile and profile.get("skills") and (
+        not skills or profile.get("updated_at", 0) > data.get("profile_updated_at", 0)
+    ):
+        skills = list(profile["skills"])
+        sort = (profile.get("filters") or {}).get("sort")
+        # Выдача в FSM посчитана по старым навыкам — отбрасываем её вместе с ними
+        await state.set_data({
+            "user_skills": skills,
+            "hh_sort": sort if sort in ranker.SORT_MODES else ranker.DEFAULT_SORT_MODE,
+            "hh_prev_results": profile.get("last_results") or [],
+            "profile_updated_at": profile.get("updated_at", 0),
+        })
+        logger.info("Профиль пользователя %s восстановлен: %s навыков", user_id, len(skills))
+    if not skills:
+        return None
+    await state.set_state(ResumeStates.editing_skills)
+    return skills
 
 async def search_hh_vacancies(skills, area=113, per_page=VACANCIES_FETCH_LIMIT, page=0):
-    # skills может быть либо списком, либо словарём по категориям
-    # Попробуем получить категории, если это словарь
-    if isinstance(skills, dict):
-        # Приоритет: языки программирования > инструменты > фреймворки
-        for cat in ["programming_languages", "tools_technologies", "frameworks_libraries"]:
-            if cat in skills and skills[cat]:
-                query_skills = skills[cat][:2]
-                break
-        else:
-            # Если ничего из приоритетного нет — берём любые навыки
-            all_skills = []
-            for v in skills.values():
-                all_skills.extend(v)
-            query_skills = all_skills[:2]
-    else:
-        # Если skills — просто список
-        query_skills = skills[:2] if skills else []
-    query = " ".join(query_skills)
-    url = "https://api.hh.ru/vacancies"
-    params = {
-        "text": query,
-        "area": area,
-        "per_page": per_page,
-        "page": 0,  # всегда только первую страницу
-        "order_by": "relevance"
-    }
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(url, params=params)
-        resp.raise_for_status()
-        data = resp.json()
-        return data.get("items", []), data.get("pages", 1)
-
-async def send_hh_vacancies(message_or_callback, state: FSMContext, page=0):
+    """
+    Ищет вакансии по всем весомым навыкам: планировщик упаковывает их
+    в как можно меньше OR-запросов, которые выполняются параллельно.
+    """
+    queries = hh.plan_queries(skills)
+    logger.info("Запросы к hh.ru: %s", queries)
+    return await hh.search_vacancies(queries, area=area, per_page=per_page)
+
+async def send_hh_vacancies(message_or_callback, state: FSMContext, page=0, edit=False):
     data = await state.get_data()
     skills = data.get("user_skills", []) or []
-    logger.info(f"Навыки для поиска: {skills}")
-    user_skills = [s.lower() for s in skills] if isinstance(skills, list) else [s.lower() for v in skills.values() for s in v]
-    # Получаем вакансии только при первом запросе, потом используем из FSM
-    if page == 0 or not data.get("sorted_vacancies"):
+    logger.debug("Навыки для поиска: %s", skills)
+    user_skills = skills if isinstance(skills, list) else [s for v in skills.values() for s in v]
+    sort_mode = data.get("hh_sort", ranker.DEFAULT_SORT_MODE)
+    # Выдача покрывает навыки, которые были у пользователя при загрузке
+    # (и добавленные позже, но не попавшие в запросы). Удаление навыка
+    # перезагрузки не требует — пул уже шире нужного
+    selected = {_skill_key(s) for s in hh.select_skills(skills)}
+    # В FSM только id и совпадения; сами вакансии должны быть в общем кэше
+    rows = data.get("hh_vacancies")
+    cached = bool(rows) and all(hh.vacancy_cache.get_item(v["id"]) is not None for v in rows)
+    cache_fresh = (
+        cached
+        and selected <= set(data.get("hh_covered_skills") or ())
+        and time.monotonic() - data.get("hh_fetched_at", 0) < VACANCIES_CACHE_TTL
+    )
+    # Загружаем вакансии только если в запросы попал новый навык или кэш устарел,
+    # иначе используем уже отранжированный набор из FSM. Смена сортировки (edit)
+    # всегда работает по загруженной выдаче, если она ещё в кэше
+    fetched = {}
+    if page == 0 and not edit and not cache_fresh or not cached:
         try:
-            vacancies, _ = await search_hh_vacancies(skills, per_page=VACANCIES_FETCH_LIMIT)
-            logger.info(f"Вакансии с hh.ru: {vacancies}")
+            search_started = time.perf_counter()
+            vacancies = await search_hh_vacancies(skills, per_page=VACANCIES_FETCH_LIMIT)
+            usage_stats.incr("searches")
+            usage_stats.observe("hh_search", time.perf_counter() - search_started)
+            logger.debug("Вакансий с hh.ru: %s", len(vacancies))
         except Exception as e:
-            logger.error(f"Ошибка при запросе к hh.ru: {e}")
+            logger.error("Ошибка при запросе к hh.ru: %s", e)
             await message_or_callback.answer("Ошибка при поиске вакансий. Попробуйте позже.")
             return
+        vacancies = [v for v in vacancies if v.get("id")]
         if not vacancies:
             await message_or_callback.answer("Вакансии по вашим навыкам не найдены на hh.ru. Попробуйте изменить или добавить навыки.")
             return
-        def count_and_list_matches(vac):
-            text = (vac.get("name", "") + " " +
-                    (vac.get("snippet", {}).get("requirement", "") or "") + " " +
-                    (vac.get("snippet", {}).get("responsibility", "") or "")
-            ).lower()
-            matched = [skill for skill in user_skills if skill in text]
-            return len(matched), matched
-        # Сортируем и сохраняем совпавшие навыки
-        vac_with_matches = []
-        for v in vacancies:
-            count, matched = count_and_list_matches(v)
-            v["_match_count"] = count
-            v["_matched_skills"] = matched
-            vac_with_matches.append(v)
-        vac_with_matches.sort(key=lambda v: v["_match_count"], reverse=True)
-        await state.update_data(sorted_vacancies=vac_with_matches, hh_page=page)
+        hh.vacancy_cache.put_items(vacancies)
+        # Одна и та же вакансия часто опубликована несколько раз — оставляем одну
+        vacancies = dedup.collapse_duplicates(vacancies, cache=hh.vacancy_cache)
+        # Предварительно ранжируем по сниппетам, затем подгружаем полные
+        # карточки лучших кандидатов и пересчитываем матрицу совпадений
+        ranker.build_match_matrix(vacancies, user_skills)
+        top = ranker.order_by(ranker.build_columns(vacancies), "match", top_k=VACANCIES_ENRICH_TOP_N)
+        enrich_started = time.perf_counter()
+        await hh.enrich_vacancies([vacancies[i] for i in top])
+        usage_stats.observe("hh_enrich", time.perf_counter() - enrich_started)
+        ranker.build_match_matrix(vacancies, user_skills)
+        # Столбцы для сортировки строятся один раз на выдачу
+        columns = ranker.build_columns(vacancies)
+        order = ranker.order_by(columns, sort_mode)
+        rows = ranker.match_rows(vacancies)
+        # Для первой страницы берём только что загруженные вакансии:
+        # пока шла загрузка карточек, другие поиски могли вытеснить их из кэша
+        fetched = {v["id"]: v for v in vacancies}
+        await state.update_data(
+            hh_vacancies=rows,
+            hh_columns=columns,
+            hh_order=order,
+            hh_sort=sort_mode,
+            hh_page=page,
+            hh_covered_skills=sorted({_skill_key(s) for s in user_skills}),
+            hh_fetched_at=time.monotonic(),
+        )
     else:
-        vac_with_matches = data["sorted_vacancies"]
+        columns = data["hh_columns"]
+        order = data["hh_order"]
     # Пагинация по 5 вакансий
     start = page * VACANCIES_PER_PAGE
     end = start + VACANCIES_PER_PAGE
-    page_vacancies = vac_with_matches[start:end]
+    page_indices = order[start:end]
+    page_vacancies = [rows[i] for i in page_indices]
     if not page_vacancies:
         await message_or_callback.answer("Больше вакансий не найдено.")
         return
-    total_pages = (len(vac_with_matches) + VACANCIES_PER_PAGE - 1) // VACANCIES_PER_PAGE
+    total_pages = (len(order) + VACANCIES_PER_PAGE - 1) // VACANCIES_PER_PAGE
+    # id выдачи из прошлого визита (профиль) — новые вакансии помечаем
+    prev_results = set(data.get("hh_prev_results") or ())
     msg = f"<b>Топ вакансий на hh.ru по вашим навыкам (стр. {page+1}/{total_pages}):</b>\n\n"
-    for v in page_vacancies:
+    for idx, row in zip(page_indices, page_vacancies):
+        v = fetched.get(row["id"]) or hh.vacancy_cache.get_item(row["id"]) or {}
         name = v.get("name", "(без названия)")
         employer = v.get("employer", {}).get("name", "")
         url = v.get("alternate_url", "")
@@ -396,8 +547,12 @@ async def send_hh_vacancies(message_or_callback, state: FSMContext, page=0):
                 salary_str = "не указана"
         else:
             salary_str = "не указана"
-        match_count = v.get("_match_count", 0)
-        matched_skills = v.get("_matched_skills", [])
+        if salary and salary.get("currency") not in ("RUR", "RUB", None) and columns["salary"][idx]:
+            salary_str += f" (≈ {columns['salary'][idx]:,.0f} ₽)".replace(",", " ")
+        match_count = row.get("_match_count", 0)
+        matched_skills = row.get("_matched_skills", [])
+        if prev_results and v.get("id") not in prev_results:
+            msg += "🆕 "
         msg += f"<b>{name}</b>\n"
         if employer:
             msg += f"Компания: {employer}\n"
@@ -407,27 +562,35 @@ async def send_hh_vacancies(message_or_callback, state: FSMContext, page=0):
         msg += f"Совпадений по навыкам: <b>{match_count}</b>\n"
         if matched_skills:
             msg += f"<i>Совпавшие навыки: {', '.join(matched_skills)}</i>\n"
+        if row.get("_duplicates_count"):
+            msg += f"Похожих публикаций скрыто: {row['_duplicates_count']}\n"
         if snippet_text:
             msg += f"<i>{snippet_text}</i>\n"
         msg += f"<a href='{url}'>Открыть вакансию</a>\n\n"
-    # Кнопка 'Показать ещё', если есть следующая страница
-    keyboard = None
-    if end < len(vac_with_matches):
-        keyboard = types.InlineKeyboardMarkup(
-            inline_keyboard=[[types.InlineKeyboardButton(text="Показать ещё", callback_data=f"more_jobs:{page+1}")]]
-        )
+    # Переключатель сортировки и кнопка 'Показать ещё', если есть следующая страница
+    keyboard = get_vacancies_keyboard(page, end < len(order), sort_mode)
     try:
-        await message_or_callback.answer(msg, parse_mode="HTML", disable_web_page_preview=True, reply_markup=keyboard)
+        if edit:
+            await message_or_callback.edit_text(msg, parse_mode="HTML", disable_web_page_preview=True, reply_markup=keyboard)
+        else:
+            await message_or_callback.answer(msg, parse_mode="HTML", disable_web_page_preview=True, reply_markup=keyboard)
+        usage_stats.incr("vacancies_shown", len(page_vacancies))
+    except TelegramBadRequest as e:
+        if "message is not modified" not in str(e):
+            logger.error("Ошибка при отправке вакансий: %s", e)
+            await message_or_callback.answer("Ошибка при отправке вакансий. Попробуйте позже.")
     except Exception as e:
-        logger.error(f"Ошибка при отправке вакансий: {e}")
+        logger.error("Ошибка при отправке вакансий: %s", e)
         await message_or_callback.answer("Ошибка при отправке вакансий. Попробуйте позже.")
     await state.update_data(hh_page=page)
 
 @router.callback_query(lambda c: c.data == "search_jobs", ResumeStates.editing_skills)
 async def search_jobs_handler(callback: types.CallbackQuery, state: FSMContext):
     logger.info("НАЖАТА КНОПКА ПОИСКА ВАКАНСИЙ")
+    await restore_profile(state, callback.from_user.id)
     await callback.answer("Ищу вакансии на hh.ru по вашим навыкам...", show_alert=False)
     await send_hh_vacancies(callback.message, state, page=0)
+    await save_profile(state, callback.from_user)
 
 @router.callback_query(lambda c: c.data and c.data.startswith("more_jobs:"), ResumeStates.editing_skills)
 async def more_jobs_handler(callback: types.CallbackQuery, state: FSMContext):
@@ -435,43 +598,25 @@ async def more_jobs_handler(callback: types.CallbackQuery, state: FSMContext):
     await callback.answer()
     await send_hh_vacancies(callback.message, state, page=page)
 
-def get_skills_keyboard(skills):
-    keyboard = []
-    if skills:
-        keyboard.append([
-            InlineKeyboardButton(text="➖ Удалить навык", callback_data="choose_del_skill"),
-        ])
-    keyboard.append([
-        InlineKeyboardButton(text="➕ Добавить навык", callback_data="add_skill"),
-        InlineKeyboardButton(text="✅ Готово", callback_data="done_skills"),
-    ])
-    keyboard.append([
-        InlineKeyboardButton(text="🔍 Найти вакансии", callback_data="search_jobs"),
-    ])
-    return InlineKeyboardMarkup(inline_keyboard=keyboard)
-
-# Клавиатура для выбора навыка для удаления
-
-def get_del_skill_keyboard(skills):
-    keyboard = []
-    for skill in skills:
-        keyboard.append([
-            InlineKeyboardButton(text=f"❌ {skill}", callback_data=f"del_skill:{skill}")
-        ])
-    keyboard.append([
-        InlineKeyboardButton(text="⬅️ Назад", callback_data="back_to_skills")
-    ])
-    return InlineKeyboardMarkup(inline_keyboard=keyboard)
-
-def format_skills_list(skills):
-    if not skills:
-        return "<i>Навыков нет</i>"
-    return (
-        "📝 <b>Ваши навыки:</b>\n"
-        "───────────────\n" +
-        "\n".join(f"• {s}" for s in skills) +
-        "\n───────────────"
-    )
+@router.callback_query(lambda c: c.data and c.data.startswith("sort_jobs:"), ResumeStates.editing_skills)
+async def sort_jobs_handler(callback: types.CallbackQuery, state: FSMContext):
+    """
+    Меняет режим сортировки уже загруженной выдачи: порядок берётся
+    из столбцов в FSM, запросов к hh.ru нет
+    """
+    mode = callback.data.split(":", 1)[1]
+    if mode not in ranker.SORT_MODES:
+        await callback.answer()
+        return
+    data = await state.get_data()
+    columns = data.get("hh_columns")
+    if not columns:
+        await callback.answer("Результаты устарели, запустите поиск заново", show_alert=True)
+        return
+    await state.update_data(hh_sort=mode, hh_order=ranker.order_by(columns, mode))
+    await callback.answer()
+    await send_hh_vacancies(callback.message, state, page=0, edit=True)
+    await save_profile(state, callback.from_user)
 
 @router.message(ResumeStates.editing_skills, F.text.regexp(r"^/del "))
 async def delete_skill_handler(message: Message, state: FSMContext):
@@ -481,6 +626,8 @@ async def delete_skill_handler(message: Message, state: FSMContext):
     if skill_to_del in skills:
         skills.remove(skill_to_del)
         await state.update_data(user_skills=skills)
+        await rerank_cached_vacancies(state, removed=skill_to_del)
+        await save_profile(state, message.from_user)
         await message.answer(f"❌ Навык <b>{skill_to_del}</b> удалён.", parse_mode="HTML")
     else:
         await message.answer(f"Навык <b>{skill_to_del}</b> не найден в списке.", parse_mode="HTML")
@@ -492,6 +639,7 @@ async def delete_skill_handler(message: Message, state: FSMContext):
 async def done_skills_handler(message: Message, state: FSMContext):
     data = await state.get_data()
     skills = data.get("user_skills", [])
+    await save_profile(state, message.from_user)
     skills_text = "\n".join(f"• {s}" for s in skills) if skills else "(ничего не осталось)"
     await message.answer(f"✅ Итоговый список навыков сохранён:\n{skills_text}", parse_mode="HTML")
     # Не очищаем FSM и не выходим из режима редактирования
@@ -516,6 +664,8 @@ async def add_skill_handler(message: Message, state: FSMContext):
     else:
         skills.append(new_skill)
         await state.update_data(user_skills=skills)
+        await rerank_cached_vacancies(state, added=new_skill)
+        await save_profile(state, message.from_user)
         await message.answer(f"➕ Навык <b>{new_skill}</b> добавлен.", parse_mode="HTML")
     # Показываем обновлённый список с кнопками
     skills_text = "\n".join(f"• {s}" for s in skills) if skills else "(ничего не осталось)"
@@ -527,15 +677,17 @@ async def inline_delete_skill_handler(callback: types.CallbackQuery, state: FSMC
     if not callback.data:
         await callback.answer("Ошибка: пустой callback.data", show_alert=True)
         return
-    skill_to_del = callback.data.split(":", 1)[1]
     data = await state.get_data()
     skills = data.get("user_skills", []) or []
-    if skill_to_del in skills:
+    skill_to_del = resolve_skill_callback(callback.data.split(":", 1)[1], skills)
+    if skill_to_del is not None:
         skills.remove(skill_to_del)
         await state.update_data(user_skills=skills)
+        await rerank_cached_vacancies(state, removed=skill_to_del)
+        await save_profile(state, callback.from_user)
         await callback.answer(f"Навык {skill_to_del} удалён", show_alert=False)
     else:
-        await callback.answer(f"Навык {skill_to_del} не найден", show_alert=True)
+        await callback.answer("Навык не найден", show_alert=True)
     # Показываем обновлённый список с кнопками
     skills_text = "\n".join(f"• {s}" for s in skills) if skills else "(ничего не осталось)"
     if callback.message:
@@ -568,6 +720,8 @@ async def add_skill_from_button_handler(message: Message, state: FSMContext):
     else:
         skills.append(new_skill)
         await state.update_data(user_skills=skills)
+        await rerank_cached_vacancies(state, added=new_skill)
+        await save_profile(state, message.from_user)
         await message.answer(f"➕ Навык <b>{new_skill}</b> добавлен.", parse_mode="HTML")
     # Показываем обновлённый список с кнопками
     skills_text = "\n".join(f"• {s}" for s in skills) if skills else "(ничего не осталось)"
@@ -586,6 +740,18 @@ async def choose_del_skill_handler(callback: types.CallbackQuery, state: FSMCont
         reply_markup=get_del_skill_keyboard(skills)
     )
 
+@router.callback_query(lambda c: c.data and c.data.startswith("del_page:"), ResumeStates.editing_skills)
+async def del_skill_page_handler(callback: types.CallbackQuery, state: FSMContext):
+    page = int(callback.data.split(":", 1)[1])
+    data = await state.get_data()
+    skills = data.get("user_skills", []) or []
+    await callback.answer()
+    try:
+        await callback.message.edit_reply_markup(reply_markup=get_del_skill_keyboard(skills, page))
+    except TelegramBadRequest as e:
+        if "message is not modified" not in str(e):
+            raise
+
 @router.callback_query(lambda c: c.data == "back_to_skills", ResumeStates.editing_skills)
 async def back_to_skills_handler(callback: types.CallbackQuery, state: FSMContext):
     data = await state.get_data()
@@ -601,6 +767,7 @@ async def done_skills_button_handler(callback: types.CallbackQuery, state: FSMCo
     # Просто вызываем done_skills_handler как если бы пользователь отправил /done
     data = await state.get_data()
     skills = data.get("user_skills", [])
+    await save_profile(state, callback.from_user)
     skills_text = "\n".join(f"• {s}" for s in skills) if skills else "(ничего не осталось)"
     await callback.message.answer(f"✅ Итоговый список навыков сохранён:\n{skills_text}", parse_mode="HTML")
     await callback.message.answer(
@@ -1,74 +1,232 @@
 # bot/keyboard.py
+import zlib
+from functools import lru_cache
+from typing import Optional, Sequence
+
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, WebAppInfo
 
+# Сколько навыков показывать на одной странице клавиатуры удаления
+# (Telegram ограничивает клавиатуру 100 кнопками)
+SKILLS_PER_PAGE = 20
+# Длина текста кнопки навыка, дальше обрезаем
+SKILL_BUTTON_MAX_LEN = 40
+# Лимит длины сообщения Telegram с запасом под оформление
+SKILLS_TEXT_MAX_LEN = 3800
+MEMO_SIZE = 512
+
+# Статичные меню собираются один раз при импорте
+_START_KEYBOARD = InlineKeyboardMarkup(
+    inline_keyboard=[
+        [
+            InlineKeyboardButton(
+                text="🚀 Начать работу",
+                callback_data="start"
+            )
+        ],
+        [
+            InlineKeyboardButton(
+                text="📄 Загрузить резюме",
+                callback_data="upload_resume"
+            )
+        ],
+        [
+            InlineKeyboardButton(
+                text="ℹ️ Помощь",
+                callback_data="help"
+            )
+        ]
+    ]
+)
+
+_WELCOME_KEYBOARD = InlineKeyboardMarkup(
+    inline_keyboard=[
+        [
+            InlineKeyboardButton(
+                text="🚀 Запустить бота",
+                web_app=WebAppInfo(url="https://t.me/your_bot_username?start=welcome")
+            )
+        ]
+    ]
+)
+
+_MAIN_MENU_KEYBOARD = InlineKeyboardMarkup(
+    inline_keyboard=[
+        [
+            InlineKeyboardButton(
+                text="📄 Загрузить резюме",
+                callback_data="upload_resume"
+            )
+        ],
+        [
+            InlineKeyboardButton(
+                text="🔍 Найти вакансии",
+                callback_data="search_jobs"
+            )
+        ],
+        [
+            InlineKeyboardButton(
+                text="📊 Статистика",
+                callback_data="statistics"
+            )
+        ],
+        [
+            InlineKeyboardButton(
+                text="ℹ️ Помощь",
+                callback_data="help"
+            )
+        ]
+    ]
+)
+
+
+def _build_skills_keyboard(has_skills: bool) -> InlineKeyboardMarkup:
+    keyboard = []
+    if has_skills:
+        keyboard.append([
+            InlineKeyboardButton(text="➖ Удалить навык", callback_data="choose_del_skill"),
+        ])
+    keyboard.append([
+        InlineKeyboardButton(text="➕ Добавить навык", callback_data="add_skill"),
+        InlineKeyboardButton(text="✅ Готово", callback_data="done_skills"),
+    ])
+    keyboard.append([
+        InlineKeyboardButton(text="🔍 Найти вакансии", callback_data="search_jobs"),
+    ])
+    return InlineKeyboardMarkup(inline_keyboard=keyboard)
+
+
+_SKILLS_KEYBOARDS = {
+    True: _build_skills_keyboard(True),
+    False: _build_skills_keyboard(False),
+}
+
+
 def get_start_keyboard() -> InlineKeyboardMarkup:
     """
     Создает клавиатуру с кнопкой /start
     """
-    keyboard = InlineKeyboardMarkup(
-        inline_keyboard=[
-            [
-                InlineKeyboardButton(
-                    text="🚀 Начать работу",
-                    callback_data="start"
-                )
-            ],
-            [
-                InlineKeyboardButton(
-                    text="📄 Загрузить резюме",
-                    callback_data="upload_resume"
-                )
-            ],
-            [
-                InlineKeyboardButton(
-                    text="ℹ️ Помощь",
-                    callback_data="help"
-                )
-            ]
-        ]
-    )
-    return keyboard
+    return _START_KEYBOARD
 
 def get_welcome_keyboard() -> InlineKeyboardMarkup:
     """
     Создает приветственную клавиатуру с кнопкой /start
     """
-    keyboard = InlineKeyboardMarkup(
-        inline_keyboard=[
-            [
-                InlineKeyboardButton(
-                    text="🚀 Запустить бота",
-                    web_app=WebAppInfo(url="https://t.me/your_bot_username?start=welcome")
-                )
-            ]
-        ]
-    )
-    return keyboard
+    return _WELCOME_KEYBOARD
 
 def get_main_menu_keyboard() -> InlineKeyboardMarkup:
     """
     Создает основное меню с кнопками
     """
-    keyboard = InlineKeyboardMarkup(
-        inline_keyboard=[
-            [
-                InlineKeyboardButton(
-                    text="📄 Загрузить резюме",
-                    callback_data="upload_resume"
-                )
-            ],
-            [
-                InlineKeyboardButton(
-                    text="🔍 Найти вакансии",
-                    callback_data="search_jobs"
-                )
-            ],
-            [
-                InlineKeyboardButton(
-                    text="ℹ️ Помощь",
-                    callback_data="help"
-                )
-            ]
-        ]
+    return _MAIN_MENU_KEYBOARD
+
+def get_skills_keyboard(skills) -> InlineKeyboardMarkup:
+    """
+    Клавиатура управления навыками; зависит только от того, есть ли навыки
+    """
+    return _SKILLS_KEYBOARDS[bool(skills)]
+
+def skill_token(skill: str) -> str:
+    """
+    Короткий отпечаток навыка для callback_data (лимит Telegram — 64 байта)
+    """
+    return format(zlib.crc32(skill.encode("utf-8")), "08x")
+
+def resolve_skill_callback(payload: str, skills: Sequence[str]) -> Optional[str]:
+    """
+    Находит навык по данным кнопки "<индекс>:<отпечаток>".
+    Если список успел измениться, ищет по отпечатку; при совпадении
+    отпечатков у нескольких навыков кнопка считается устаревшей.
+    Старые кнопки с полным названием навыка тоже поддерживаются.
+    """
+    idx, sep, token = payload.partition(":")
+    if not sep or not idx.isdigit():
+        return payload if payload in skills else None
+    idx = int(idx)
+    if idx < len(skills) and skill_token(skills[idx]) == token:
+        return skills[idx]
+    matches = [skill for skill in skills if skill_token(skill) == token]
+    return matches[0] if len(matches) == 1 else None
+
+def _button_text(skill: str) -> str:
+    if len(skill) > SKILL_BUTTON_MAX_LEN:
+        skill = skill[:SKILL_BUTTON_MAX_LEN - 1] + "…"
+    return f"❌ {skill}"
+
+@lru_cache(maxsize=MEMO_SIZE)
+def _del_skill_keyboard(skills: tuple, page: int) -> InlineKeyboardMarkup:
+    total_pages = max(1, (len(skills) + SKILLS_PER_PAGE - 1) // SKILLS_PER_PAGE)
+    page = min(max(page, 0), total_pages - 1)
+    start = page * SKILLS_PER_PAGE
+    keyboard = []
+    for idx in range(start, min(start + SKILLS_PER_PAGE, len(skills))):
+        skill = skills[idx]
+        keyboard.append([
+            InlineKeyboardButton(text=_button_text(skill), callback_data=f"del_skill:{idx}:{skill_token(skill)}")
+        ])
+    if total_pages > 1:
+        nav = []
+        if page > 0:
+            nav.append(InlineKeyboardButton(text="◀️", callback_data=f"del_page:{page - 1}"))
+        nav.append(InlineKeyboardButton(text=f"{page + 1}/{total_pages}", callback_data=f"del_page:{page}"))
+        if page < total_pages - 1:
+            nav.append(InlineKeyboardButton(text="▶️", callback_data=f"del_page:{page + 1}"))
+        keyboard.append(nav)
+    keyboard.append([
+        InlineKeyboardButton(text="⬅️ Назад", callback_data="back_to_skills")
+    ])
+    return InlineKeyboardMarkup(inline_keyboard=keyboard)
+
+def get_del_skill_keyboard(skills, page: int = 0) -> InlineKeyboardMarkup:
+    """
+    Клавиатура выбора навыка для удаления, по SKILLS_PER_PAGE навыков на странице
+    """
+    return _del_skill_keyboard(tuple(skills), page)
+
+@lru_cache(maxsize=MEMO_SIZE)
+def _format_skills_list(skills: tuple) -> str:
+    if not skills:
+        return "<i>Навыков нет</i>"
+    lines = []
+    length = 0
+    for i, skill in enumerate(skills):
+        line = f"• {skill}"
+        if length + len(line) > SKILLS_TEXT_MAX_LEN:
+            lines.append(f"… и ещё {len(skills) - i}")
+            break
+        lines.append(line)
+        length += len(line) + 1
+    return (
+        "📝 <b>Ваши навыки:</b>\n"
+        "───────────────\n" +
+        "\n".join(lines) +
+        "\n───────────────"
     )
-    return keyboard
+
+def format_skills_list(skills) -> str:
+    return _format_skills_list(tuple(skills or ()))
+
+_SORT_LABELS = {
+    "match": "🎯 Совпадения",
+    "salary": "💰 Зарплата",
+    "date": "🗓️ Дата",
+    "combined": "⚖️ Всё вместе",
+}
+
+@lru_cache(maxsize=MEMO_SIZE)
+def get_vacancies_keyboard(page: int, has_more: bool, sort_mode: str) -> InlineKeyboardMarkup:
+    """
+    Клавиатура под страницей вакансий: режимы сортировки и 'Показать ещё'
+    """
+    sort_row = [
+        InlineKeyboardButton(
+            text=f"• {label}" if mode == sort_mode else label,
+            callback_data=f"sort_jobs:{mode}"
+        )
+        for mode, label in _SORT_LABELS.items()
+    ]
+    keyboard = [sort_row[:2], sort_row[2:]]
+    if has_more:
+        keyboard.append([
+            InlineKeyboardButton(text="Показать ещё", callback_data=f"more_jobs:{page + 1}")
+        ])
+    return InlineKeyboardMarkup(inline_keyboard=keyboard)
@@ -1,32 +1,54 @@
 # bot/main.py
+import asyncio
 import logging
+import os
 from aiogram import Bot, Dispatcher, F
-from aiogram.filters import CommandStart
+from aiogram.filters import Command, CommandStart
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.filters import StateFilter
 from bot.handlers.resume import ResumeStates
 from bot.handlers.resume import router as resume_router
 from bot.handlers.callbacks import router as callbacks_router
-from bot.keyboard import get_start_keyboard
+from bot.handlers.callbacks import format_statistics
+from bot.handlers.resume import restore_profile
+from bot.handlers.profile import router as profile_router
+from bot.keyboard import format_skills_list, get_skills_keyboard, get_start_keyboard
 from bot.env import TG_TOKEN
+from bot.middlewares import TraceIdMiddleware
+from core.log import setup_logging
+from core.profiles import profile_store
+from core.stats import usage_stats
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+setup_logging()
 logger = logging.getLogger(__name__)
 
+ADMIN_IDS = {int(x) for x in os.getenv("ADMIN_IDS", "").split(",") if x.strip()}
+
 bot = Bot(token=TG_TOKEN)
 dp = Dispatcher()
+dp.update.outer_middleware(TraceIdMiddleware())
 
 dp.include_router(callbacks_router)
 logger.info("✅ Роутер callbacks подключен")
+# Команды профиля должны срабатывать раньше ввода навыков в роутере резюме
+dp.include_router(profile_router)
+logger.info("✅ Роутер профилей подключен")
 dp.include_router(resume_router)
 logger.info("✅ Роутер резюме подключен")
 
 @dp.message(CommandStart())
-async def start_handler(message):
-    logger.info(f"Команда /start от пользователя {message.from_user.id if message.from_user else 'Unknown'}")
+async def start_handler(message, state):
+    logger.info("Команда /start от пользователя %s", message.from_user.id if message.from_user else 'Unknown')
+    # Вернувшийся пользователь сразу получает свои навыки из профиля
+    skills = await restore_profile(state, message.from_user.id) if message.from_user else None
+    if skills:
+        await message.answer(
+            "👋 С возвращением! Навыки из прошлого раза уже загружены — "
+            "можно сразу искать вакансии или пришлите новое резюме.\n\n" + format_skills_list(skills),
+            parse_mode="HTML",
+            reply_markup=get_skills_keyboard(skills)
+        )
+        return
     args = message.text.split()[1:] if len(message.text.split()) > 1 else []
     if args and args[0] == "welcome":
         await message.answer(
@@ -42,13 +64,38 @@ async def start_handler(message):
             reply_markup=get_start_keyboard()
         )
 
-@dp.message(F.text, ~StateFilter(ResumeStates.editing_skills), ~StateFilter(ResumeStates.waiting_new_skill))
-async def any_message_handler(message):
-    logger.info(f"Получено текстовое сообщение от {message.from_user.id if message.from_user else 'Unknown'}")
-    if message.text.startswith('/'):
-        logger.info("Игнорирую команду")
+@dp.message(Command("stats"))
+async def stats_command_handler(message):
+    """
+    Подробная статистика для администраторов (ADMIN_IDS в .env)
+    """
+    user_id = message.from_user.id if message.from_user else None
+    if user_id not in ADMIN_IDS:
+        logger.debug("Команда /stats от не-администратора %s", user_id)
         return
+    await message.answer(format_statistics(usage_stats.snapshot, detailed=True))
+
+@dp.startup()
+async def on_startup():
+    usage_stats.start()
+    profile_store.start()
+
+@dp.shutdown()
+async def on_shutdown():
+    await usage_stats.stop()
+    await profile_store.stop()
+
+# Команды сюда не попадают, чтобы их обработали роутеры (например, /export_profile)
+@dp.message(F.text, ~F.text.startswith("/"), ~StateFilter(ResumeStates.editing_skills), ~StateFilter(ResumeStates.waiting_new_skill))
+async def any_message_handler(message):
+    logger.debug("Получено текстовое сообщение от %s", message.from_user.id if message.from_user else 'Unknown')
     await message.answer(
         "👋 Добро пожаловать! Выберите действие:",
         reply_markup=get_start_keyboard()
     )
+
+async def main():
+    await dp.start_polling(bot)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,26 @@
+# bot/middlewares.py
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import Update
+
+from core.log import new_trace_id, trace_id_var
+
+
+class TraceIdMiddleware(BaseMiddleware):
+    """
+    Присваивает каждому входящему апдейту trace_id, который попадает во все
+    записи лога при его обработке — от хэндлера до запросов к hh.ru и разбора PDF
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any],
+    ) -> Any:
+        token = trace_id_var.set(new_trace_id(event.update_id))
+        try:
+            return await handler(event, data)
+        finally:
+            trace_id_var.reset(token)
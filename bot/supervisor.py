@@ -0,0 +1,494 @@
+# bot/supervisor.py
+"""
+Многопроцессный режим бота.
+
+Супервизор сам получает апдейты из Telegram (long polling) и раздаёт их
+N рабочим процессам. В каждом работает тот же Dispatcher с роутерами
+из bot/main.py. Апдейт попадает к воркеру по консистентному хэшу user id.
+Поэтому все апдейты пользователя обрабатываются одним процессом, по очереди,
+и его FSM-состояние остаётся в памяти этого процесса.
+
+Воркеры шлют heartbeat; упавший или зависший воркер перезапускается.
+Каждый обработанный апдейт воркер подтверждает (ack). Неподтверждённые
+апдейты упавшего воркера отправляются заново (не больше MAX_REDELIVERIES
+раз), поэтому доставка — «хотя бы один раз»: апдейт, обработанный прямо
+перед падением, может обработаться повторно.
+Число воркеров меняется на лету сигналами SIGUSR1 (+1) и SIGUSR2 (-1).
+Благодаря кольцу хэшей при этом переезжает только ~1/N пользователей.
+
+Переезд пользователя происходит на его первом апдейте после перестройки
+кольца. Новые апдейты придерживаются в супервизоре, пока прежний воркер
+не доделает уже полученные апдейты этого пользователя и не отдаст его
+FSM из MemoryStorage; FSM передаётся новому воркеру раньше придержанных
+апдейтов. Выводимый из работы воркер перед выходом отдаёт FSM всех своих
+пользователей. Так порядок апдейтов пользователя и его FSM сохраняются.
+FSM упавшего воркера теряется; навыки тогда восстанавливаются из профиля.
+
+Запуск:
+    python -m bot.supervisor --workers 4
+"""
+import argparse
+import asyncio
+import bisect
+import dataclasses
+import glob
+import hashlib
+import logging
+import multiprocessing as mp
+import os
+import queue
+import signal
+import time
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_SECONDS = 2
+HEARTBEAT_TIMEOUT = 30
+# Воркер импортирует aiogram и PDF-движки, первый heartbeat приходит не сразу
+STARTUP_TIMEOUT = 120
+HEALTH_CHECK_SECONDS = 1
+RESTART_BACKOFF_SECONDS = 1
+RESTART_BACKOFF_MAX = 60
+# Сколько раз повторно отправлять апдейт, на котором падают воркеры
+MAX_REDELIVERIES = 2
+POLL_TIMEOUT = 30
+VIRTUAL_NODES = 128
+
+
+class HashRing:
+    """
+    Кольцо консистентного хэширования с виртуальными узлами
+    """
+
+    def __init__(self, nodes=(), vnodes: int = VIRTUAL_NODES):
+        self.vnodes = vnodes
+        self._keys: List[int] = []
+        self._nodes: List[int] = []
+        self.rebuild(nodes)
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+    def rebuild(self, nodes) -> None:
+        points = sorted(
+            (self._hash(f"worker-{node}#{i}"), node)
+            for node in nodes
+            for i in range(self.vnodes)
+        )
+        self._keys = [p[0] for p in points]
+        self._nodes = [p[1] for p in points]
+
+    def node_for(self, key) -> Optional[int]:
+        if not self._keys:
+            return None
+        idx = bisect.bisect(self._keys, self._hash(str(key))) % len(self._keys)
+        return self._nodes[idx]
+
+
+def update_user_key(update) -> int:
+    """
+    Ключ шардирования: id пользователя, иначе id чата, иначе id апдейта
+    """
+    try:
+        event = update.event
+    except Exception:
+        return update.update_id
+    user = getattr(event, "from_user", None)
+    if user is not None:
+        return user.id
+    chat = getattr(event, "chat", None)
+    if chat is not None:
+        return chat.id
+    return update.update_id
+
+
+# --- Перенос FSM между воркерами ---
+
+def _fsm_keys(storage, user_key: int) -> list:
+    return [key for key in storage.storage if key.user_id == user_key or key.chat_id == user_key]
+
+
+def fsm_users(storage) -> set:
+    from aiogram.fsm.storage.memory import MemoryStorage
+    if not isinstance(storage, MemoryStorage):
+        return set()
+    return {key.user_id for key in storage.storage}
+
+
+def export_fsm(storage, user_key: int) -> Optional[list]:
+    """
+    Забирает FSM пользователя из памяти воркера для переезда на другой воркер.
+    None — хранилище общее для процессов, переносить нечего.
+    """
+    from aiogram.fsm.storage.memory import MemoryStorage
+    if not isinstance(storage, MemoryStorage):
+        return None
+    records = []
+    for key in _fsm_keys(storage, user_key):
+        record = storage.storage.pop(key)
+        if record.state is not None or record.data:
+            records.append((dataclasses.asdict(key), record.state, record.data))
+    return records
+
+
+def import_fsm(storage, user_key: int, records: Optional[list]) -> None:
+    """
+    Принимает FSM переехавшего пользователя. Оставшееся от его прошлого
+    пребывания на этом воркере состояние устарело и удаляется.
+    """
+    from aiogram.fsm.storage.base import StorageKey
+    from aiogram.fsm.storage.memory import MemoryStorage
+    if records is None or not isinstance(storage, MemoryStorage):
+        return
+    for key in _fsm_keys(storage, user_key):
+        del storage.storage[key]
+    for fields, state, data in records:
+        record = storage.storage[StorageKey(**fields)]
+        record.state = state
+        record.data = data
+
+
+# --- Рабочий процесс ---
+
+def _worker_main(worker_id: int, inbox, status) -> None:
+    # Остановкой по Ctrl+C управляет супервизор
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # У каждого воркера свой файл статистики, иначе процессы затирали бы общий;
+    # снимок для показа складывается из файлов всех воркеров
+    stats_path = os.getenv("STATS_PATH", "data/stats.json")
+    root, ext = os.path.splitext(stats_path)
+    os.environ["STATS_PATH"] = f"{root}.worker{worker_id}{ext}"
+    os.environ["STATS_SHARDS_GLOB"] = f"{glob.escape(root)}.worker*{ext}"
+    asyncio.run(_worker_loop(worker_id, inbox, status))
+
+
+async def _worker_loop(worker_id: int, inbox, status) -> None:
+    from aiogram.types import Update
+    from bot.main import bot, dp
+
+    loop = asyncio.get_running_loop()
+    worker_logger = logging.getLogger(f"{__name__}.worker{worker_id}")
+    await dp.emit_startup(bot=bot, dispatcher=dp)
+    worker_logger.info("Воркер %s запущен (pid %s)", worker_id, os.getpid())
+
+    # Последняя задача каждого пользователя: следующая ждёт её, так что
+    # апдейты и передача FSM одного пользователя выполняются строго по порядку
+    tails: Dict[int, asyncio.Task] = {}
+
+    async def handle(update: Update) -> None:
+        try:
+            await dp.feed_update(bot, update)
+        except Exception:
+            worker_logger.exception("Ошибка при обработке апдейта %s", update.update_id)
+        # Ошибка хэндлера тоже подтверждение: повтор её не исправит
+        status.put(("ack", worker_id, os.getpid(), update.update_id))
+
+    async def hand_off(user_key: int) -> None:
+        status.put(("handoff", worker_id, os.getpid(), (user_key, export_fsm(dp.storage, user_key))))
+
+    async def take_over(user_key: int, records: Optional[list]) -> None:
+        import_fsm(dp.storage, user_key, records)
+
+    async def after(prev: Optional[asyncio.Task], job) -> None:
+        if prev is not None:
+            await asyncio.wait({prev})
+        await job
+
+    def forget(key: int, task: asyncio.Task) -> None:
+        if tails.get(key) is task:
+            del tails[key]
+
+    def get_item():
+        try:
+            return inbox.get(timeout=HEARTBEAT_SECONDS)
+        except queue.Empty:
+            return ()
+
+    last_beat = 0.0
+    retiring = False
+    try:
+        while True:
+            item = await loop.run_in_executor(None, get_item)
+            now = time.monotonic()
+            if now - last_beat >= HEARTBEAT_SECONDS:
+                status.put(("heartbeat", worker_id, os.getpid(), len(tails)))
+                last_beat = now
+            if item == ():
+                continue
+            if item is None:
+                break
+            kind, user_key, payload = item
+            if kind == "retire":
+                retiring = True
+                break
+            if kind == "update":
+                job = handle(Update.model_validate_json(payload, context={"bot": bot}))
+            elif kind == "handoff":
+                job = hand_off(user_key)
+            else:
+                job = take_over(user_key, payload)
+            task = asyncio.create_task(after(tails.get(user_key), job))
+            tails[user_key] = task
+            task.add_done_callback(lambda t, k=user_key: forget(k, t))
+    finally:
+        if tails:
+            await asyncio.wait(set(tails.values()))
+        if retiring:
+            # Пользователи выводимого воркера переезжают вместе с FSM
+            for user_key in fsm_users(dp.storage):
+                await hand_off(user_key)
+        await dp.emit_shutdown(bot=bot, dispatcher=dp)
+        await bot.session.close()
+        worker_logger.info("Воркер %s остановлен", worker_id)
+
+
+# --- Супервизор ---
+
+class WorkerHandle:
+    def __init__(self, worker_id: int, process, inbox):
+        self.worker_id = worker_id
+        self.process = process
+        self.inbox = inbox
+        self.started_at = time.monotonic()
+        self.last_heartbeat = time.monotonic()
+        self.ready = False
+        self.inflight = 0
+        self.restarts = 0
+        self.stopping = False
+        # update_id -> (ключ пользователя, апдейт в JSON, число повторных отправок)
+        self.unacked: Dict[int, tuple] = {}
+
+
+class Supervisor:
+    def __init__(self, workers: int, token: str):
+        self.token = token
+        self.target_workers = workers
+        self.ctx = mp.get_context("spawn")
+        self.status = self.ctx.Queue()
+        self.workers: Dict[int, WorkerHandle] = {}
+        self.retiring: List[WorkerHandle] = []
+        self.ring = HashRing()
+        # Воркер, в памяти которого FSM пользователя и его неподтверждённые апдейты.
+        # Хранится для всех пользователей: по нему FSM переносится при переезде
+        self.owners: Dict[int, WorkerHandle] = {}
+        # Апдейты переезжающих пользователей, ждущие передачи FSM:
+        # ключ -> [(update_id, ключ, апдейт в JSON, число повторных отправок)]
+        self.held: Dict[int, list] = {}
+        self._stopping = False
+
+    def _spawn(self, worker_id: int, restarts: int = 0) -> WorkerHandle:
+        inbox = self.ctx.Queue()
+        process = self.ctx.Process(
+            target=_worker_main,
+            args=(worker_id, inbox, self.status),
+            name=f"bot-worker-{worker_id}",
+            daemon=False,
+        )
+        process.start()
+        handle = WorkerHandle(worker_id, process, inbox)
+        handle.restarts = restarts
+        logger.info("Запущен воркер %s (pid %s)", worker_id, process.pid)
+        return handle
+
+    def resize(self, workers: int) -> None:
+        """
+        Меняет число воркеров и перестраивает кольцо.
+        Удаляемые воркеры дорабатывают полученные апдейты и выходят.
+        """
+        workers = max(1, workers)
+        self.target_workers = workers
+        for worker_id in range(workers):
+            if worker_id not in self.workers:
+                self.workers[worker_id] = self._spawn(worker_id)
+        for worker_id in sorted(self.workers):
+            if worker_id >= workers:
+                handle = self.workers.pop(worker_id)
+                handle.stopping = True
+                handle.inbox.put(("retire", None, None))
+                self.retiring.append(handle)
+                logger.info("Воркер %s выводится из работы", worker_id)
+        self.ring.rebuild(sorted(self.workers))
+        logger.info("Воркеров: %s", len(self.workers))
+
+    def dispatch(self, update) -> None:
+        self._send(update.update_id, update_user_key(update), update.model_dump_json(exclude_none=True))
+
+    def _send(self, update_id: int, user_key: int, raw: str, attempts: int = 0) -> None:
+        held = self.held.get(user_key)
+        if held is not None:
+            held.append((update_id, user_key, raw, attempts))
+            return
+        handle = self.workers[self.ring.node_for(user_key)]
+        owner = self.owners.get(user_key)
+        if owner is not None and owner is not handle:
+            # Пользователь переехал: ждём, пока прежний воркер доделает его апдейты
+            # и отдаст FSM. Выводимый воркер отдаст FSM сам перед выходом
+            self.held[user_key] = [(update_id, user_key, raw, attempts)]
+            if not owner.stopping:
+                owner.inbox.put(("handoff", user_key, None))
+            return
+        self.owners[user_key] = handle
+        handle.unacked[update_id] = (user_key, raw, attempts)
+        handle.inbox.put(("update", user_key, raw))
+
+    def _handed_off(self, handle: WorkerHandle, user_key: int, records: Optional[list]) -> None:
+        """
+        Прежний воркер доделал апдейты пользователя и отдал его FSM:
+        FSM и придержанные апдейты уходят новому воркеру
+        """
+        if self.owners.get(user_key) is not handle:
+            return
+        target = self.workers[self.ring.node_for(user_key)]
+        target.inbox.put(("fsm", user_key, records))
+        self.owners[user_key] = target
+        for item in self.held.pop(user_key, ()):
+            self._send(*item)
+
+    def _redeliver(self, handle: WorkerHandle) -> None:
+        """
+        Заново раздаёт апдейты, которые воркер так и не подтвердил.
+        Они старше придержанных апдейтов тех же пользователей, поэтому уходят первыми.
+        """
+        pending, handle.unacked = handle.unacked, {}
+        held = {}
+        for user_key in [key for key, owner in self.owners.items() if owner is handle]:
+            del self.owners[user_key]
+            if user_key in self.held:
+                held[user_key] = self.held.pop(user_key)
+        if pending:
+            logger.warning("Воркер %s не подтвердил %s апдейтов, отправляю повторно", handle.worker_id, len(pending))
+        for update_id, (user_key, raw, attempts) in pending.items():
+            if attempts >= MAX_REDELIVERIES:
+                logger.error("Апдейт %s отброшен после %s повторных отправок", update_id, attempts)
+                continue
+            self._send(update_id, user_key, raw, attempts + 1)
+        for items in held.values():
+            for item in items:
+                self._send(*item)
+
+    def _find_handle(self, worker_id: int, pid: int) -> Optional[WorkerHandle]:
+        handle = self.workers.get(worker_id)
+        if handle is not None and handle.process.pid == pid:
+            return handle
+        for handle in self.retiring:
+            if handle.worker_id == worker_id and handle.process.pid == pid:
+                return handle
+        return None
+
+    def _drain_status(self) -> None:
+        while True:
+            try:
+                kind, worker_id, pid, value = self.status.get_nowait()
+            except queue.Empty:
+                return
+            handle = self._find_handle(worker_id, pid)
+            if handle is None:
+                continue
+            if kind == "heartbeat":
+                handle.last_heartbeat = time.monotonic()
+                handle.ready = True
+                handle.inflight = value
+            elif kind == "ack":
+                handle.unacked.pop(value, None)
+            elif kind == "handoff":
+                self._handed_off(handle, *value)
+
+    def check_health(self) -> None:
+        self._drain_status()
+        now = time.monotonic()
+        for worker_id, handle in list(self.workers.items()):
+            alive = handle.process.is_alive()
+            timeout = HEARTBEAT_TIMEOUT if handle.ready else STARTUP_TIMEOUT
+            stale = now - handle.last_heartbeat > timeout
+            if alive and not stale:
+                continue
+            backoff = min(RESTART_BACKOFF_MAX, RESTART_BACKOFF_SECONDS * 2 ** handle.restarts)
+            # Воркер, который падает сразу после старта, перезапускаем с задержкой
+            if now - handle.started_at < backoff:
+                continue
+            if alive:
+                logger.error("Воркер %s не отвечает %.0f с, перезапуск", worker_id, now - handle.last_heartbeat)
+                handle.process.terminate()
+                handle.process.join(5)
+            else:
+                logger.error("Воркер %s завершился с кодом %s, перезапуск", worker_id, handle.process.exitcode)
+            restarts = handle.restarts + 1 if now - handle.started_at < RESTART_BACKOFF_MAX else 0
+            # Очередь старого воркера не переиспользуем: убитый процесс мог
+            # оставить её блокировку захваченной. Его апдейты раздаются заново
+            self.workers[worker_id] = self._spawn(worker_id, restarts=restarts)
+            self._redeliver(handle)
+        for handle in list(self.retiring):
+            if not handle.process.is_alive():
+                handle.process.join()
+                # Подтверждения и FSM, отправленные перед выходом, уже в очереди статусов
+                self._drain_status()
+                self.retiring.remove(handle)
+                self._redeliver(handle)
+
+    async def _health_loop(self) -> None:
+        while not self._stopping:
+            self.check_health()
+            await asyncio.sleep(HEALTH_CHECK_SECONDS)
+
+    async def _poll_loop(self) -> None:
+        from aiogram import Bot
+        bot = Bot(token=self.token)
+        offset = None
+        try:
+            while not self._stopping:
+                try:
+                    updates = await bot.get_updates(offset=offset, timeout=POLL_TIMEOUT)
+                except Exception as e:
+                    logger.error("Ошибка получения апдейтов: %s", e)
+                    await asyncio.sleep(5)
+                    continue
+                for update in updates:
+                    offset = update.update_id + 1
+                    self.dispatch(update)
+        finally:
+            await bot.session.close()
+
+    def stop(self) -> None:
+        self._stopping = True
+        for handle in list(self.workers.values()) + self.retiring:
+            if handle.process.is_alive():
+                handle.inbox.put(None)
+        for handle in list(self.workers.values()) + self.retiring:
+            handle.process.join(30)
+            if handle.process.is_alive():
+                handle.process.terminate()
+
+    async def run(self) -> None:
+        self.resize(self.target_workers)
+        loop = asyncio.get_running_loop()
+        if hasattr(signal, "SIGUSR1"):
+            loop.add_signal_handler(signal.SIGUSR1, lambda: self.resize(len(self.workers) + 1))
+            loop.add_signal_handler(signal.SIGUSR2, lambda: self.resize(len(self.workers) - 1))
+        tasks = [asyncio.create_task(self._poll_loop()), asyncio.create_task(self._health_loop())]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бот в нескольких процессах")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    from bot.env import TG_TOKEN
+    from core.log import setup_logging
+    setup_logging()
+    supervisor = Supervisor(args.workers, TG_TOKEN)
+    try:
+        asyncio.run(supervisor.run())
+    except KeyboardInterrupt:
+        logger.info("Остановка супервизора")
+
+
+if __name__ == "__main__":
+    main()
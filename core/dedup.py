@@ -0,0 +1,176 @@
+# core/dedup.py
+"""
+Схлопывание почти одинаковых вакансий.
+
+Текст вакансии (название, работодатель, сниппет) нормализуется и режется
+на шинглы — пары соседних слов. Похожесть двух вакансий — коэффициент
+Жаккара их множеств шинглов. Чтобы не сравнивать все пары, для каждой
+вакансии считается MinHash-подпись из NUM_PERM значений, а подпись
+режется на BANDS полос по ROWS значений (LSH): вакансии с Жаккаром 0.6
+попадают в общую корзину хотя бы одной полосы с вероятностью > 0.99.
+
+Кандидаты из корзин проверяются точно: Жаккар текста не ниже
+JACCARD_THRESHOLD, тот же работодатель и похожее название. Проверка
+названия нужна потому, что работодатели публикуют разные вакансии
+с одинаковым шаблонным описанием.
+
+Порог подобран по перепубликациям с правками в одно слово (добавлено,
+удалено или заменено): для текстов в ~16 слов Жаккар шинглов у них
+не ниже ~0.7.
+"""
+import hashlib
+import re
+from typing import List, Tuple
+
+SHINGLE_SIZE = 2
+NUM_PERM = 32
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+# Минимальная похожесть текстов дублей (коэффициент Жаккара шинглов)
+JACCARD_THRESHOLD = 0.6
+# Минимальная похожесть названий (Жаккар по словам)
+TITLE_THRESHOLD = 0.5
+
+_MERSENNE_PRIME = (1 << 61) - 1
+# Параметры хэш-функций вида (a * x + b) mod p, фиксированы, чтобы подписи
+# в общем кэше были сравнимы между поисками
+_PERMUTATIONS = [
+    (
+        int.from_bytes(hashlib.blake2b(f"a{i}".encode(), digest_size=8).digest(), "big") % (_MERSENNE_PRIME - 1) + 1,
+        int.from_bytes(hashlib.blake2b(f"b{i}".encode(), digest_size=8).digest(), "big") % _MERSENNE_PRIME,
+    )
+    for i in range(NUM_PERM)
+]
+
+
+def normalize_text(text: str) -> str:
+    text = re.sub(r"<[^>]+>", " ", text or "")
+    text = re.sub(r"[^\w\s]", " ", text.lower())
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def vacancy_fingerprint_text(vac: dict) -> str:
+    snippet = vac.get("snippet") or {}
+    employer = (vac.get("employer") or {}).get("name", "")
+    return normalize_text(" ".join([
+        vac.get("name", "") or "",
+        employer or "",
+        snippet.get("requirement", "") or "",
+        snippet.get("responsibility", "") or "",
+    ]))
+
+
+def shingles(text: str) -> frozenset:
+    words = text.split()
+    if len(words) <= SHINGLE_SIZE:
+        return frozenset([" ".join(words)]) if words else frozenset()
+    return frozenset(" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1))
+
+
+def jaccard(a: frozenset, b: frozenset) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def _hash64(token: str) -> int:
+    return int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), "big")
+
+
+def minhash(tokens) -> Tuple[int, ...]:
+    hashes = [_hash64(token) for token in tokens] or [0]
+    return tuple(
+        min((a * h + b) % _MERSENNE_PRIME for h in hashes)
+        for a, b in _PERMUTATIONS
+    )
+
+
+def vacancy_signature(vac: dict, cache=None) -> Tuple[Tuple[int, ...], frozenset]:
+    """
+    MinHash-подпись и шинглы вакансии; при наличии кэша (core.fetchers.hh.vacancy_cache)
+    берутся из него и сохраняются туда, чтобы не считать повторно.
+    """
+    vac_id = vac.get("id")
+    if cache is not None and vac_id:
+        fingerprint = cache.get_fingerprint(vac_id)
+        vac_shingles = cache.get_shingles(vac_id)
+        if fingerprint is not None and vac_shingles is not None:
+            return fingerprint, vac_shingles
+    vac_shingles = shingles(vacancy_fingerprint_text(vac))
+    fingerprint = minhash(vac_shingles)
+    if cache is not None and vac_id:
+        cache.set_fingerprint(vac_id, fingerprint, vac_shingles)
+    return fingerprint, vac_shingles
+
+
+def vacancy_fingerprint(vac: dict, cache=None) -> Tuple[int, ...]:
+    return vacancy_signature(vac, cache)[0]
+
+
+def _bands(fingerprint: Tuple[int, ...]):
+    for band in range(BANDS):
+        yield band, fingerprint[band * ROWS:(band + 1) * ROWS]
+
+
+def _employer_key(vac: dict):
+    employer = vac.get("employer") or {}
+    return employer.get("id") or normalize_text(employer.get("name", ""))
+
+
+def _sketch(vac: dict, vac_shingles: frozenset) -> tuple:
+    """
+    Всё, что нужно для точной проверки пары: работодатель, слова названия, шинглы.
+    Считается один раз на вакансию за проход.
+    """
+    return _employer_key(vac), frozenset(normalize_text(vac.get("name", "")).split()), vac_shingles
+
+
+def _same(sketch: tuple, other: tuple) -> bool:
+    employer, title, vac_shingles = sketch
+    other_employer, other_title, other_shingles = other
+    return (
+        employer == other_employer
+        and jaccard(title, other_title) >= TITLE_THRESHOLD
+        and jaccard(vac_shingles, other_shingles) >= JACCARD_THRESHOLD
+    )
+
+
+def is_duplicate(vac: dict, other: dict) -> bool:
+    """
+    Точная проверка пары кандидатов из LSH
+    """
+    return _same(
+        _sketch(vac, shingles(vacancy_fingerprint_text(vac))),
+        _sketch(other, shingles(vacancy_fingerprint_text(other))),
+    )
+
+
+def collapse_duplicates(vacancies: List[dict], cache=None) -> List[dict]:
+    """
+    Оставляет первую (самую релевантную) вакансию из каждой группы дублей.
+    У оставшейся вакансии в _duplicates_count записывается число скрытых копий.
+    """
+    buckets = {}
+    unique = []
+    for vac in vacancies:
+        fingerprint, vac_shingles = vacancy_signature(vac, cache)
+        sketch = _sketch(vac, vac_shingles)
+        original = None
+        checked = set()
+        for key in _bands(fingerprint):
+            for candidate_sketch, candidate in buckets.get(key, ()):
+                if id(candidate) in checked:
+                    continue
+                checked.add(id(candidate))
+                if _same(sketch, candidate_sketch):
+                    original = candidate
+                    break
+            if original is not None:
+                break
+        if original is not None:
+            original["_duplicates_count"] = original.get("_duplicates_count", 0) + 1
+            continue
+        for key in _bands(fingerprint):
+            buckets.setdefault(key, []).append((sketch, vac))
+        unique.append(vac)
+    return unique
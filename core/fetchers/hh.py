@@ -0,0 +1,402 @@
+# core/fetchers/hh.py
+"""
+Работа с API hh.ru: планирование поисковых запросов и загрузка вакансий.
+
+Планировщик выбирает навыки по их различающей силе и упаковывает их
+в небольшое число булевых запросов ("python" OR "django" ...), которые
+выполняются параллельно; результаты сливаются в один пул без дублей.
+Для лучших кандидатов подгружаются полные карточки (/vacancies/{id})
+с общим для всех пользователей кэшем и ревалидацией по ETag/Last-Modified.
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple, Union
+
+import httpx
+
+from core import ranker
+
+logger = logging.getLogger(__name__)
+
+# Можно переопределить, например, для локального стенда loadtest.mock_hh
+HH_API_URL = os.getenv("HH_API_URL", "https://api.hh.ru")
+
+# Ограничения планировщика: не больше MAX_QUERIES запросов на поиск.
+# Навыки дописываются в OR-выражение, пока оно не длиннее MAX_QUERY_LENGTH,
+# следующий запрос заводится только когда навык уже не помещается
+MAX_QUERIES = 3
+# hh.ru не принимает слишком длинный text, держим запас
+MAX_QUERY_LENGTH = 300
+# Максимум per_page, который разрешает API
+MAX_PER_PAGE = 100
+
+# Загрузка полных карточек вакансий
+DETAILS_CONCURRENCY = 8
+DETAILS_CACHE_SIZE = 5000
+# В течение этого времени карточка из кэша отдаётся без запроса к hh.ru,
+# после — ревалидируется условным запросом
+DETAILS_FRESH_SECONDS = 3600
+
+# Насколько навык из категории сужает выдачу: язык программирования
+# или фреймворк отличает вакансию сильнее, чем офисный пакет или soft skill
+CATEGORY_WEIGHTS = {
+    'programming_languages': 1.0,
+    'frameworks_libraries': 0.95,
+    'databases': 0.8,
+    'cloud_platforms': 0.8,
+    'methodologies': 0.4,
+    'tools_technologies': 0.35,
+    'soft_skills': 0.1,
+}
+UNKNOWN_SKILL_WEIGHT = 0.6
+
+_skill_categories = None
+
+
+def _get_skill_categories() -> Dict[str, str]:
+    global _skill_categories
+    if _skill_categories is None:
+        _skill_categories = {}
+        try:
+            from core.skills_extractor import skills_extractor
+            for category, skills in skills_extractor.skills_dict.items():
+                for skill in skills:
+                    _skill_categories.setdefault(skill.lower(), category)
+        except ImportError:
+            logger.warning("skills_extractor недоступен, веса навыков по умолчанию")
+    return _skill_categories
+
+
+def skill_weight(skill: str, category: str = None) -> float:
+    """
+    Различающий вес навыка для поискового запроса
+    """
+    skill_lower = skill.lower().strip()
+    category = category or _get_skill_categories().get(skill_lower)
+    weight = CATEGORY_WEIGHTS.get(category, UNKNOWN_SKILL_WEIGHT)
+    # Однобуквенные и двухбуквенные навыки (r, go, c) дают много шума в полнотексте
+    if len(skill_lower) <= 2:
+        weight *= 0.5
+    return weight
+
+
+def _flatten_skills(skills: Union[List[str], Dict[str, List[str]]]) -> List[tuple]:
+    if isinstance(skills, dict):
+        pairs = [(s, cat) for cat, cat_skills in skills.items() for s in cat_skills]
+    else:
+        pairs = [(s, None) for s in (skills or [])]
+    seen = set()
+    result = []
+    for skill, category in pairs:
+        key = skill.lower().strip()
+        if key and key not in seen:
+            seen.add(key)
+            result.append((skill.strip(), category))
+    return result
+
+
+def _quote(skill: str) -> str:
+    return '"' + skill.replace('"', '') + '"'
+
+
+def _pack_skills(skills, max_queries: int) -> List[List[str]]:
+    """
+    Раскладывает навыки от самых весомых к менее весомым по OR-запросам:
+    навык попадает в первый запрос, где он ещё помещается в MAX_QUERY_LENGTH.
+    Навыки, которые не поместились ни в один из max_queries запросов, отбрасываются.
+    """
+    pairs = _flatten_skills(skills)
+    weighted = sorted(
+        ((skill_weight(skill, category), idx, skill) for idx, (skill, category) in enumerate(pairs)),
+        key=lambda x: (-x[0], x[1]),
+    )
+    groups: List[List[str]] = []
+    lengths: List[int] = []
+    for _, _, skill in weighted:
+        term_length = len(_quote(skill))
+        for i in range(len(groups)):
+            if lengths[i] + len(" OR ") + term_length <= MAX_QUERY_LENGTH:
+                groups[i].append(skill)
+                lengths[i] += len(" OR ") + term_length
+                break
+        else:
+            if len(groups) < max_queries and term_length <= MAX_QUERY_LENGTH:
+                groups.append([skill])
+                lengths.append(term_length)
+    return groups
+
+
+def select_skills(skills, max_queries: int = MAX_QUERIES) -> List[str]:
+    """
+    Навыки, которые попадут в запросы к hh.ru
+    """
+    return [skill for group in _pack_skills(skills, max_queries) for skill in group]
+
+
+def plan_queries(skills, max_queries: int = MAX_QUERIES) -> List[str]:
+    """
+    Строит минимальный набор OR-запросов, покрывающих самые весомые навыки.
+    Обычно это один запрос; второй нужен, только если навыки не помещаются
+    в MAX_QUERY_LENGTH.
+    """
+    return [" OR ".join(_quote(skill) for skill in group) for group in _pack_skills(skills, max_queries)]
+
+
+def merge_results(results: List[List[dict]]) -> List[dict]:
+    """
+    Сливает выдачи нескольких запросов по кругу и убирает дубли по id,
+    чтобы верх пула состоял из лучших результатов каждого запроса
+    """
+    merged = []
+    seen = set()
+    longest = max((len(items) for items in results), default=0)
+    for i in range(longest):
+        for items in results:
+            if i >= len(items):
+                continue
+            vac = items[i]
+            vac_id = vac.get("id")
+            if vac_id in seen:
+                continue
+            if vac_id is not None:
+                seen.add(vac_id)
+            merged.append(vac)
+    return merged
+
+
+async def fetch_vacancies_page(client: httpx.AsyncClient, query: str, area=113, per_page=50, page=0):
+    params = {
+        "text": query,
+        "area": area,
+        "per_page": min(per_page, MAX_PER_PAGE),
+        "page": page,
+        "order_by": "relevance"
+    }
+    resp = await client.get(f"{HH_API_URL}/vacancies", params=params)
+    resp.raise_for_status()
+    data = resp.json()
+    return data.get("items", []), data.get("pages", 1)
+
+
+async def search_vacancies(queries: List[str], area=113, per_page=50) -> List[dict]:
+    """
+    Выполняет запросы параллельно и возвращает общий пул вакансий без дублей.
+    Ошибка отдельного запроса не роняет поиск, если хотя бы один запрос удался.
+    """
+    if not queries:
+        return []
+    async with httpx.AsyncClient() as client:
+        responses = await asyncio.gather(
+            *(fetch_vacancies_page(client, q, area=area, per_page=per_page) for q in queries),
+            return_exceptions=True,
+        )
+    results = []
+    errors = []
+    for query, resp in zip(queries, responses):
+        if isinstance(resp, Exception):
+            logger.error("Ошибка запроса к hh.ru (%s): %s", query, resp)
+            errors.append(resp)
+            continue
+        results.append(resp[0])
+    if errors and not results:
+        raise errors[0]
+    return merge_results(results)
+
+
+class VacancyCache:
+    """
+    LRU-кэш вакансий по id, общий для всех пользователей.
+    Запись: {"item", "data", "etag", "last_modified", "checked_at", "fingerprint",
+    "shingles", "text"}: вакансия из поисковой выдачи, полная карточка и её
+    заголовки, MinHash-подпись и шинглы для схлопывания дублей и текст для
+    поиска навыков; любого поля может не быть.
+    Пользовательская выдача в FSM хранит только id, остальное берётся отсюда.
+    Идущие сейчас загрузки карточек хранятся в _inflight, чтобы одновременные
+    поиски разных пользователей ждали один запрос, а не делали свои.
+    """
+
+    def __init__(self, max_size: int = DETAILS_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    def get(self, vac_id: str) -> Optional[dict]:
+        entry = self._entries.get(vac_id)
+        if entry is not None:
+            self._entries.move_to_end(vac_id)
+        return entry
+
+    def _entry(self, vac_id: str) -> dict:
+        entry = self._entries.setdefault(vac_id, {})
+        self._entries.move_to_end(vac_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return entry
+
+    def put(self, vac_id: str, data: dict, etag: str = None, last_modified: str = None) -> dict:
+        entry = self._entry(vac_id)
+        entry.update(
+            data=data,
+            etag=etag,
+            last_modified=last_modified,
+            checked_at=time.monotonic(),
+        )
+        # Текст пересобирается с учётом новой карточки
+        entry.pop("text", None)
+        return entry
+
+    def put_items(self, vacancies: List[dict]) -> None:
+        """
+        Запоминает вакансии поисковой выдачи. Служебные поля (_...) не копируются:
+        в них пишутся данные конкретного пользователя.
+        """
+        for vac in vacancies:
+            if vac.get("id"):
+                entry = self._entry(vac["id"])
+                entry["item"] = {k: v for k, v in vac.items() if not k.startswith("_")}
+                entry.pop("text", None)
+
+    def get_item(self, vac_id: str) -> Optional[dict]:
+        entry = self.get(vac_id)
+        return entry.get("item") if entry else None
+
+    def search_text(self, vac_id: str) -> Optional[str]:
+        """
+        Текст вакансии для поиска навыков (ranker.vacancy_text) с учётом
+        полной карточки; None, если вакансии уже нет в кэше
+        """
+        entry = self.get(vac_id)
+        if not entry or entry.get("item") is None:
+            return None
+        text = entry.get("text")
+        if text is None:
+            vac = dict(entry["item"])
+            if entry.get("data"):
+                vac.update(_card_fields(entry["data"]))
+            text = entry["text"] = ranker.vacancy_text(vac)
+        return text
+
+    def get_fingerprint(self, vac_id: str) -> Optional[Tuple[int, ...]]:
+        entry = self.get(vac_id)
+        return entry.get("fingerprint") if entry else None
+
+    def get_shingles(self, vac_id: str) -> Optional[frozenset]:
+        entry = self.get(vac_id)
+        return entry.get("shingles") if entry else None
+
+    def set_fingerprint(self, vac_id: str, fingerprint: Tuple[int, ...], shingles: frozenset) -> None:
+        entry = self._entry(vac_id)
+        entry["fingerprint"] = fingerprint
+        entry["shingles"] = shingles
+
+    def inflight(self, vac_id: str) -> Optional[asyncio.Future]:
+        return self._inflight.get(vac_id)
+
+    def begin_fetch(self, vac_id: str) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[vac_id] = future
+        return future
+
+    def end_fetch(self, vac_id: str, future: asyncio.Future) -> None:
+        if self._inflight.get(vac_id) is future:
+            del self._inflight[vac_id]
+
+    def touch(self, vac_id: str) -> None:
+        entry = self._entries.get(vac_id)
+        if entry is not None:
+            entry["checked_at"] = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+vacancy_cache = VacancyCache()
+
+
+async def fetch_vacancy_details(client: httpx.AsyncClient, vac_id: str, semaphore: asyncio.Semaphore) -> Optional[dict]:
+    """
+    Полная карточка вакансии. Свежая запись кэша отдаётся без запроса,
+    устаревшая — ревалидируется (304 Not Modified не скачивает тело заново).
+    Если карточку уже загружает другой поиск, ждём его результат.
+    """
+    entry = vacancy_cache.get(vac_id)
+    if entry and entry.get("data") is None:
+        entry = None
+    if entry and time.monotonic() - entry["checked_at"] < DETAILS_FRESH_SECONDS:
+        return entry["data"]
+    future = vacancy_cache.inflight(vac_id)
+    if future is not None:
+        # shield: отмена одного ожидающего не должна отменять общую загрузку
+        return await asyncio.shield(future)
+    future = vacancy_cache.begin_fetch(vac_id)
+    try:
+        data = await _download_vacancy_details(client, vac_id, semaphore, entry)
+    except BaseException as e:
+        if isinstance(e, asyncio.CancelledError):
+            future.set_exception(RuntimeError(f"загрузка вакансии {vac_id} отменена"))
+        else:
+            future.set_exception(e)
+        # Ожидающих может не быть — помечаем исключение как полученное
+        future.exception()
+        raise
+    else:
+        future.set_result(data)
+        return data
+    finally:
+        vacancy_cache.end_fetch(vac_id, future)
+
+
+async def _download_vacancy_details(client: httpx.AsyncClient, vac_id: str, semaphore: asyncio.Semaphore,
+                                    entry: Optional[dict]) -> dict:
+    headers = {}
+    if entry:
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+    async with semaphore:
+        resp = await client.get(f"{HH_API_URL}/vacancies/{vac_id}", headers=headers)
+    if resp.status_code == 304 and entry:
+        vacancy_cache.touch(vac_id)
+        return entry["data"]
+    resp.raise_for_status()
+    data = resp.json()
+    vacancy_cache.put(vac_id, data, resp.headers.get("ETag"), resp.headers.get("Last-Modified"))
+    return data
+
+
+def _card_fields(detail: dict) -> dict:
+    return {
+        "key_skills": [ks.get("name", "") for ks in detail.get("key_skills") or []],
+        "description": detail.get("description") or "",
+    }
+
+
+async def enrich_vacancies(vacancies: List[dict], concurrency: int = DETAILS_CONCURRENCY) -> List[dict]:
+    """
+    Дополняет вакансии из поисковой выдачи полями key_skills и description
+    из полной карточки. Вакансии, карточку которых получить не удалось,
+    остаются со сниппетом.
+    """
+    to_fetch = [v for v in vacancies if v.get("id") and "key_skills" not in v]
+    if not to_fetch:
+        return vacancies
+    semaphore = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient() as client:
+        details = await asyncio.gather(
+            *(fetch_vacancy_details(client, v["id"], semaphore) for v in to_fetch),
+            return_exceptions=True,
+        )
+    enriched = 0
+    for vac, detail in zip(to_fetch, details):
+        if isinstance(detail, Exception) or not detail:
+            if isinstance(detail, Exception):
+                logger.warning("Не удалось загрузить вакансию %s: %s", vac['id'], detail)
+            continue
+        vac.update(_card_fields(detail))
+        enriched += 1
+    logger.info("Загружено карточек вакансий: %s/%s, в кэше: %s", enriched, len(to_fetch), len(vacancy_cache))
+    return vacancies
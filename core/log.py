@@ -0,0 +1,161 @@
+# core/log.py
+"""
+Неблокирующее структурированное логирование.
+
+Обработчики только кладут записи в очередь (LocalQueueHandler), а подстановку
+аргументов, форматирование трейсбэка и вывод в JSON выполняет фоновый поток
+QueueListener, поэтому запись лога не задерживает event loop. Каждая запись
+несёт trace_id текущего апдейта: он хранится в contextvar и переходит
+в задачи asyncio и потоки asyncio.to_thread.
+
+Подробные пошаговые сообщения пишутся на уровне DEBUG и сэмплируются
+по trace_id: для попавшего в выборку апдейта сохраняется вся цепочка.
+Сэмплирование работает и при LOG_LEVEL=INFO: логгеры бота (APP_LOGGERS)
+пропускают DEBUG, а остальное отсекает фильтр по LOG_LEVEL. Сторонние
+библиотеки остаются на LOG_LEVEL.
+
+Переменные окружения:
+    LOG_LEVEL          — уровень корневого логгера (по умолчанию INFO)
+    LOG_FORMAT         — json или text (по умолчанию json)
+    LOG_DEBUG_SAMPLE   — доля апдейтов, для которых пишется DEBUG (по умолчанию 0.1)
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import uuid
+import zlib
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+trace_id_var: ContextVar[str] = ContextVar("trace_id", default="-")
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+# Логгеры нашего кода; __main__ — bot/main.py при запуске через python -m
+APP_LOGGERS = ("bot", "core", "__main__")
+
+
+def new_trace_id(update_id=None) -> str:
+    suffix = uuid.uuid4().hex[:8]
+    return f"{update_id}-{suffix}" if update_id is not None else suffix
+
+
+class TraceIdFilter(logging.Filter):
+    """
+    Добавляет trace_id в запись в потоке, где она создана
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.trace_id = trace_id_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Пропускает записи уровней из rates только для доли трасс.
+    Решение детерминировано по trace_id, поэтому трасса либо видна целиком,
+    либо не видна вовсе. Прочие записи ниже min_level отбрасываются.
+    """
+
+    def __init__(self, rates: Dict[int, float], min_level: int = logging.NOTSET):
+        super().__init__()
+        self.rates = rates
+        self.min_level = min_level
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = self.rates.get(record.levelno)
+        if rate is None:
+            return record.levelno >= self.min_level
+        if rate >= 1:
+            return True
+        if rate <= 0:
+            return False
+        trace_id = getattr(record, "trace_id", "-")
+        if trace_id == "-":
+            return random.random() < rate
+        return zlib.crc32(trace_id.encode()) % 10000 < rate * 10000
+
+
+class LocalQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler для очереди внутри процесса. Стандартный prepare форматирует
+    сообщение и трейсбэк в вызывающем потоке, чтобы запись можно было
+    сериализовать; здесь сериализация не нужна, и запись уходит в очередь
+    как есть. Аргументы сообщения подставляются уже в потоке listener'а,
+    поэтому их нельзя менять после вызова логгера.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "trace_id": getattr(record, "trace_id", "-"),
+            "msg": record.getMessage(),
+        }
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload["exc"] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False)
+
+
+def setup_logging(level: str = None, fmt: str = None, debug_sample: float = None) -> logging.handlers.QueueListener:
+    """
+    Настраивает корневой логгер. Повторный вызов возвращает уже запущенный listener.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+    level = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
+    fmt = fmt or os.getenv("LOG_FORMAT", "json")
+    if debug_sample is None:
+        debug_sample = float(os.getenv("LOG_DEBUG_SAMPLE", "0.1"))
+
+    stream_handler = logging.StreamHandler()
+    if fmt == "json":
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter(
+            '%(asctime)s - %(name)s - %(levelname)s - [%(trace_id)s] %(message)s'
+        ))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = LocalQueueHandler(log_queue)
+    queue_handler.addFilter(TraceIdFilter())
+    root = logging.getLogger()
+    root.handlers[:] = [queue_handler]
+    root.setLevel(level)
+    min_level = root.level
+    queue_handler.addFilter(SamplingFilter({logging.DEBUG: debug_sample}, min_level=min_level))
+    # Чтобы сэмплу было что пропускать, наши логгеры создают DEBUG-записи
+    # при любом LOG_LEVEL; всё, что ниже LOG_LEVEL и не DEBUG, отсекает фильтр
+    if debug_sample > 0 and min_level > logging.DEBUG:
+        for name in APP_LOGGERS:
+            logging.getLogger(name).setLevel(logging.DEBUG)
+    # Логи httpx о каждом запросе дублируют наши и шумят на INFO
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+
+def stop_logging() -> None:
+    """
+    Дописывает оставшиеся в очереди записи и останавливает фоновый поток
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
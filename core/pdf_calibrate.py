@@ -0,0 +1,43 @@
+# core/pdf_calibrate.py
+"""
+Замер установленных PDF-движков на примерах резюме и выбор движка по умолчанию.
+
+    python -m core.pdf_calibrate path/to/resumes/ --repeats 3
+"""
+import argparse
+from pathlib import Path
+from typing import List
+
+from core.pdf_parser import CALIBRATION_PATH, available_backends, calibrate
+
+
+def _collect_pdfs(inputs: List[str]) -> List[str]:
+    paths = []
+    for item in inputs:
+        p = Path(item)
+        if p.is_dir():
+            paths.extend(str(x) for x in sorted(p.rglob("*.pdf")))
+        elif p.suffix.lower() == ".pdf":
+            paths.append(str(p))
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Калибровка PDF-движков")
+    parser.add_argument("inputs", nargs="+", help="PDF-файлы или папки с ними")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--dry-run", action="store_true", help="не сохранять выбор")
+    args = parser.parse_args()
+
+    print("Установленные движки:", ", ".join(available_backends()))
+    paths = _collect_pdfs(args.inputs)
+    if not paths:
+        parser.error("не найдено ни одного PDF")
+    report = calibrate(paths, repeats=args.repeats, save=not args.dry_run)
+    for name, r in sorted(report["results"].items(), key=lambda x: x[1]["seconds_per_doc"]):
+        print(f"{name:<10} {r['seconds_per_doc'] * 1000:8.1f} мс/док  текст: {r['extracted']}/{len(paths)}  ошибок: {r['failed']}")
+    print(f"Выбран движок: {report['backend']}" + ("" if args.dry_run else f" (сохранено в {CALIBRATION_PATH})"))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,144 @@
-from pdfminer.high_level import extract_text
+"""
+Извлечение текста из PDF.
+
+Поддерживается несколько движков: pdfminer.six (по умолчанию в requirements)
+и более быстрые необязательные pypdfium2, PyMuPDF и pdftotext. Все они
+дают одинаково очищенный текст. Если движок упал или вернул пустой текст,
+документ пробуется следующим по порядку.
+
+Порядок задаётся переменной PDF_BACKEND или калибровкой:
+    python -m core.pdf_calibrate path/to/resumes/ --repeats 3
+которая замеряет установленные движки на примерах и сохраняет самый быстрый
+в data/pdf_backend.json.
+"""
+import json
+import logging
+import os
 import re
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
 
-def pdf_to_text(path: str) -> str:
+logger = logging.getLogger(__name__)
+
+CALIBRATION_PATH = Path(os.getenv("PDF_CALIBRATION_PATH", "data/pdf_backend.json"))
+# Порядок по умолчанию: от быстрых движков к медленному pdfminer
+PREFERRED_ORDER = ["pypdfium2", "pymupdf", "pdftotext", "pdfminer"]
+
+_BACKENDS: Dict[str, Callable[[str], str]] = {}
+
+try:
+    from pdfminer.high_level import extract_text as _pdfminer_extract_text
+
+    def _pdfminer_extract(path: str) -> str:
+        return _pdfminer_extract_text(path)
+
+    _BACKENDS["pdfminer"] = _pdfminer_extract
+except ImportError:
+    pass
+
+try:
+    import pypdfium2 as _pdfium
+
+    def _pypdfium2_extract(path: str) -> str:
+        pdf = _pdfium.PdfDocument(path)
+        try:
+            return "\n".join(page.get_textpage().get_text_range() for page in pdf)
+        finally:
+            pdf.close()
+
+    _BACKENDS["pypdfium2"] = _pypdfium2_extract
+except ImportError:
+    pass
+
+try:
     try:
-        raw = extract_text(path)
-        if not raw:
-            return ""
-        cleaned = re.sub(r'\s+', ' ', raw)
-        cleaned = re.sub(r'[^\w\s\.\,\!\?\;\:\-\(\)\[\]\{\}]', '', cleaned)
-        cleaned = re.sub(r'\s{2,}', ' ', cleaned)
-        return cleaned.strip()
-    except Exception as e:
-        print(f"Ошибка при обработке PDF файла {path}: {e}")
+        import pymupdf as _fitz
+    except ImportError:
+        import fitz as _fitz
+
+    def _pymupdf_extract(path: str) -> str:
+        with _fitz.open(path) as doc:
+            return "\n".join(page.get_text() for page in doc)
+
+    _BACKENDS["pymupdf"] = _pymupdf_extract
+except ImportError:
+    pass
+
+try:
+    import pdftotext as _pdftotext
+
+    def _pdftotext_extract(path: str) -> str:
+        with open(path, "rb") as f:
+            return "\n".join(_pdftotext.PDF(f))
+
+    _BACKENDS["pdftotext"] = _pdftotext_extract
+except ImportError:
+    pass
+
+if not _BACKENDS:
+    raise ImportError("Нет ни одного движка для PDF: установите pdfminer.six или pypdfium2/PyMuPDF/pdftotext")
+
+_default_backend: Optional[str] = None
+_default_loaded = False
+
+
+def available_backends() -> List[str]:
+    return [name for name in PREFERRED_ORDER if name in _BACKENDS]
+
+
+def _load_default_backend() -> Optional[str]:
+    global _default_backend, _default_loaded
+    if not _default_loaded:
+        _default_loaded = True
+        name = os.getenv("PDF_BACKEND")
+        if not name and CALIBRATION_PATH.exists():
+            try:
+                with open(CALIBRATION_PATH, encoding="utf-8") as f:
+                    name = json.load(f).get("backend")
+            except Exception as e:
+                logger.error("Не удалось прочитать калибровку PDF %s: %s", CALIBRATION_PATH, e)
+        if name and name not in _BACKENDS:
+            logger.warning("PDF-движок %s недоступен, используется порядок по умолчанию", name)
+            name = None
+        _default_backend = name
+    return _default_backend
+
+
+def backend_order() -> List[str]:
+    order = available_backends()
+    default = _load_default_backend()
+    if default:
+        order.remove(default)
+        order.insert(0, default)
+    return order
+
+
+def clean_text(raw: str) -> str:
+    if not raw:
         return ""
+    cleaned = re.sub(r'\s+', ' ', raw)
+    cleaned = re.sub(r'[^\w\s\.\,\!\?\;\:\-\(\)\[\]\{\}]', '', cleaned)
+    cleaned = re.sub(r'\s{2,}', ' ', cleaned)
+    return cleaned.strip()
+
+
+def extract_with(backend: str, path: str) -> str:
+    return clean_text(_BACKENDS[backend](path))
+
+
+def pdf_to_text(path: str) -> str:
+    for backend in backend_order():
+        try:
+            text = extract_with(backend, path)
+        except Exception as e:
+            logger.warning("Ошибка движка %s при обработке PDF файла %s: %s", backend, path, e)
+            continue
+        if text:
+            return text
+        logger.debug("Движок %s вернул пустой текст для %s", backend, path)
+    logger.error("Не удалось извлечь текст из PDF файла %s ни одним движком", path)
+    return ""
 
 def extract_words_from_pdf(path: str) -> list:
     text = pdf_to_text(path)
@@ -40,4 +166,41 @@ def get_word_statistics(path: str) -> dict:
         'unique_words': len(word_freq),
         'word_frequency': word_freq,
         'most_common_words': sorted_words[:20]
-    }
\ No newline at end of file
+    }
+
+
+def calibrate(paths: List[str], repeats: int = 3, save: bool = True) -> dict:
+    """
+    Замеряет каждый установленный движок на наборе PDF и выбирает самый быстрый
+    среди тех, что извлекли текст не из меньшего числа файлов, чем лучший.
+    """
+    global _default_loaded
+    results = {}
+    for backend in available_backends():
+        extracted = 0
+        failed = 0
+        started = time.perf_counter()
+        for _ in range(repeats):
+            for path in paths:
+                try:
+                    if extract_with(backend, path):
+                        extracted += 1
+                except Exception:
+                    failed += 1
+        elapsed = time.perf_counter() - started
+        results[backend] = {
+            "seconds_per_doc": elapsed / max(1, repeats * len(paths)),
+            "extracted": extracted // repeats,
+            "failed": failed // repeats,
+        }
+    best_coverage = max(r["extracted"] for r in results.values())
+    candidates = [name for name, r in results.items() if r["extracted"] == best_coverage]
+    backend = min(candidates, key=lambda name: results[name]["seconds_per_doc"])
+    report = {"backend": backend, "documents": len(paths), "results": results}
+    if save:
+        CALIBRATION_PATH.parent.mkdir(parents=True, exist_ok=True)
+        with open(CALIBRATION_PATH, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        # Новый выбор подхватится при следующем извлечении
+        _default_loaded = False
+    return report
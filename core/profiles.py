@@ -0,0 +1,274 @@
+# core/profiles.py
+"""
+Сохранённые профили пользователей.
+
+Профиль — это компактная запись: подтверждённые навыки, фильтры поиска
+(режим сортировки) и id вакансий последней выдачи. Он нужен, чтобы
+вернувшийся пользователь мог сразу искать вакансии, не загружая резюме
+заново, когда FSM уже пуст.
+
+Хранилище — встроенный SQLite. Хэндлеры меняют профиль только в памяти
+(remember), а фоновая задача раз в PROFILE_FLUSH_SECONDS пакетно пишет
+изменения на диск (write-behind). Профиль читается с диска лениво, при
+обращении пользователя. Та же задача периодически удаляет профили,
+не обновлявшиеся PROFILE_TTL_DAYS дней.
+
+Файл общий для воркеров супервизора, а пользователь может переехать на
+другой воркер при изменении их числа. Поэтому прочитанный профиль живёт
+в кэше не дольше PROFILE_CACHE_SECONDS, отсутствие профиля не кэшируется,
+а восстановление FSM (get(..., fresh=True)) всегда читает файл.
+"""
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PROFILES_PATH = Path(os.getenv("PROFILES_PATH", "data/profiles.sqlite3"))
+PROFILE_TTL_DAYS = int(os.getenv("PROFILE_TTL_DAYS", "90"))
+PROFILE_FLUSH_SECONDS = 5
+PROFILE_CLEANUP_SECONDS = 3600
+PROFILE_CACHE_SIZE = 10000
+PROFILE_CACHE_SECONDS = 30
+PROFILE_VERSION = 1
+# Ограничения на профиль, в том числе импортируемый из файла
+MAX_PROFILE_SKILLS = 200
+MAX_SKILL_LENGTH = 100
+LAST_RESULTS_LIMIT = 50
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles (
+    user_id INTEGER PRIMARY KEY,
+    data TEXT NOT NULL,
+    updated_at REAL NOT NULL
+)
+"""
+
+
+class ProfileError(ValueError):
+    """
+    Некорректный профиль (например, при импорте из файла)
+    """
+
+
+def make_profile(skills: Iterable[str], sort: Optional[str] = None,
+                 last_results: Iterable = ()) -> dict:
+    profile = {
+        "version": PROFILE_VERSION,
+        "skills": [str(s) for s in skills][:MAX_PROFILE_SKILLS],
+        "filters": {},
+        "last_results": [str(r) for r in last_results][:LAST_RESULTS_LIMIT],
+    }
+    if sort:
+        profile["filters"]["sort"] = sort
+    return profile
+
+
+def export_profile(profile: dict) -> bytes:
+    return json.dumps(profile, ensure_ascii=False, indent=2).encode("utf-8")
+
+
+def import_profile(raw: bytes) -> dict:
+    """
+    Разбирает и проверяет профиль, выгруженный export_profile
+    """
+    try:
+        data = json.loads(raw.decode("utf-8"))
+    except (UnicodeDecodeError, ValueError) as e:
+        raise ProfileError(f"файл не является JSON: {e}")
+    if not isinstance(data, dict):
+        raise ProfileError("ожидается JSON-объект")
+    skills = data.get("skills")
+    if not isinstance(skills, list) or not all(isinstance(s, str) for s in skills):
+        raise ProfileError("поле skills должно быть списком строк")
+    skills = list(dict.fromkeys(s.strip() for s in skills if s.strip()))
+    if len(skills) > MAX_PROFILE_SKILLS:
+        raise ProfileError(f"слишком много навыков (больше {MAX_PROFILE_SKILLS})")
+    if any(len(s) > MAX_SKILL_LENGTH for s in skills):
+        raise ProfileError(f"навык длиннее {MAX_SKILL_LENGTH} символов")
+    filters = data.get("filters") if isinstance(data.get("filters"), dict) else {}
+    sort = filters.get("sort") if isinstance(filters.get("sort"), str) else None
+    last_results = data.get("last_results") if isinstance(data.get("last_results"), list) else []
+    return make_profile(skills, sort=sort, last_results=last_results)
+
+
+class ProfileStore:
+    def __init__(self, path: Path = PROFILES_PATH, cache_size: int = PROFILE_CACHE_SIZE):
+        self.path = path
+        self.cache_size = cache_size
+        # user_id -> (профиль, время чтения с диска)
+        self._cache: "OrderedDict[int, tuple]" = OrderedDict()
+        self._pending: Dict[int, dict] = {}
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    # --- Работа с SQLite, выполняется в отдельном потоке ---
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # Соединение используется из потоков to_thread по очереди, под self._lock
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+            # WAL позволяет воркерам супервизора писать в один файл
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(_SCHEMA)
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _load(self, user_id: int) -> Optional[dict]:
+        row = self._connect().execute(
+            "SELECT data FROM profiles WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _write(self, rows: List[tuple]) -> None:
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO profiles (user_id, data, updated_at) VALUES (?, ?, ?)",
+                rows,
+            )
+
+    def _delete(self, user_id: int) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM profiles WHERE user_id = ?", (user_id,))
+
+    def _delete_older(self, cutoff: float) -> int:
+        conn = self._connect()
+        with conn:
+            return conn.execute("DELETE FROM profiles WHERE updated_at < ?", (cutoff,)).rowcount
+
+    # --- Кэш ---
+
+    def _cache_put(self, user_id: int, profile: dict) -> None:
+        self._cache[user_id] = (profile, time.monotonic())
+        self._cache.move_to_end(user_id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _cache_get(self, user_id: int) -> Optional[dict]:
+        cached = self._cache.get(user_id)
+        if cached is None:
+            return None
+        profile, loaded_at = cached
+        if time.monotonic() - loaded_at >= PROFILE_CACHE_SECONDS:
+            del self._cache[user_id]
+            return None
+        self._cache.move_to_end(user_id)
+        return profile
+
+    # --- Публичный интерфейс ---
+
+    async def get(self, user_id: int, fresh: bool = False) -> Optional[dict]:
+        """
+        Профиль пользователя. Несохранённые изменения этого процесса важнее всего,
+        затем кэш (если не fresh), затем файл.
+        """
+        if user_id in self._pending:
+            return self._pending[user_id]
+        if not fresh:
+            profile = self._cache_get(user_id)
+            if profile is not None:
+                return profile
+        async with self._lock:
+            try:
+                profile = await asyncio.to_thread(self._load, user_id)
+            except Exception as e:
+                logger.error("Не удалось загрузить профиль %s: %s", user_id, e)
+                return None
+        # Пока читали с диска, профиль могли обновить в памяти
+        if user_id in self._pending:
+            return self._pending[user_id]
+        if profile is None:
+            self._cache.pop(user_id, None)
+        else:
+            self._cache_put(user_id, profile)
+        return profile
+
+    def remember(self, user_id: int, profile: dict) -> None:
+        """
+        Обновляет профиль в памяти; на диск он попадёт при следующем flush
+        """
+        profile["updated_at"] = time.time()
+        self._pending[user_id] = profile
+        self._cache_put(user_id, profile)
+
+    async def delete(self, user_id: int) -> None:
+        self._pending.pop(user_id, None)
+        self._cache.pop(user_id, None)
+        async with self._lock:
+            await asyncio.to_thread(self._delete, user_id)
+
+    async def flush(self) -> None:
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        rows = [
+            (user_id, json.dumps(profile, ensure_ascii=False), profile["updated_at"])
+            for user_id, profile in pending.items()
+        ]
+        async with self._lock:
+            try:
+                await asyncio.to_thread(self._write, rows)
+            except Exception as e:
+                # Возвращаем несохранённое, не затирая более свежие изменения
+                for user_id, profile in pending.items():
+                    self._pending.setdefault(user_id, profile)
+                logger.error("Не удалось сохранить профили: %s", e)
+                return
+        logger.debug("Сохранено профилей: %s", len(rows))
+
+    async def cleanup(self, max_age_days: float = PROFILE_TTL_DAYS) -> int:
+        """
+        Удаляет профили, которые не обновлялись дольше max_age_days
+        """
+        cutoff = time.time() - max_age_days * 86400
+        async with self._lock:
+            try:
+                removed = await asyncio.to_thread(self._delete_older, cutoff)
+            except Exception as e:
+                logger.error("Не удалось удалить устаревшие профили: %s", e)
+                return 0
+        for user_id, (profile, _) in list(self._cache.items()):
+            if profile.get("updated_at", 0) < cutoff:
+                del self._cache[user_id]
+        if removed:
+            logger.info("Удалено устаревших профилей: %s", removed)
+        return removed
+
+    async def _background_loop(self, interval: float, cleanup_interval: float) -> None:
+        last_cleanup = time.monotonic()
+        await self.cleanup()
+        while True:
+            await asyncio.sleep(interval)
+            await self.flush()
+            if time.monotonic() - last_cleanup >= cleanup_interval:
+                last_cleanup = time.monotonic()
+                await self.cleanup()
+
+    def start(self, interval: float = PROFILE_FLUSH_SECONDS,
+              cleanup_interval: float = PROFILE_CLEANUP_SECONDS) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._background_loop(interval, cleanup_interval))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+profile_store = ProfileStore()
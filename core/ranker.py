@@ -0,0 +1,209 @@
+# core/ranker.py
+"""
+Ранжирование вакансий по совпадениям с навыками пользователя.
+
+Для каждой вакансии хранится строка матрицы совпадений (_matched_skills),
+поэтому добавление или удаление одного навыка пересчитывает счёт как дельту
+по уже загруженным вакансиям, без повторного запроса к hh.ru. В FSM
+пользователя лежат только эти строки (match_rows); сами вакансии и их
+текст для поиска навыков — в общем кэше core.fetchers.hh.vacancy_cache.
+
+Выдача хранится в порядке hh.ru и не пересортировывается. Для сортировки
+один раз строятся параллельные столбцы (счёт совпадений, зарплата в рублях,
+время публикации), и любой режим сортировки — это лишь порядок индексов
+по этим столбцам.
+"""
+import datetime
+import heapq
+import re
+from typing import Dict, List, Optional
+
+
+def vacancy_text(vac: dict) -> str:
+    """
+    Текст вакансии в нижнем регистре, по которому ищутся навыки.
+    Если вакансия дополнена полной карточкой, учитываются key_skills и описание.
+    """
+    snippet = vac.get("snippet") or {}
+    parts = [
+        vac.get("name", "") or "",
+        snippet.get("requirement", "") or "",
+        snippet.get("responsibility", "") or "",
+    ]
+    parts.extend(vac.get("key_skills") or [])
+    description = vac.get("description")
+    if description:
+        parts.append(re.sub(r"<[^>]+>", " ", description))
+    return " ".join(parts).lower()
+
+
+def build_match_matrix(vacancies: List[dict], skills: List[str]) -> List[dict]:
+    """
+    Полный расчёт совпадений для свежей выдачи.
+    Заполняет _matched_skills, _match_count и _rank; порядок не меняет.
+    """
+    user_skills = [s.lower() for s in skills]
+    for rank, v in enumerate(vacancies):
+        text = vacancy_text(v)
+        matched = [skill for skill in user_skills if skill in text]
+        v["_rank"] = rank
+        v["_matched_skills"] = matched
+        v["_match_count"] = len(matched)
+    return vacancies
+
+
+def match_rows(vacancies: List[dict]) -> List[dict]:
+    """
+    Строки матрицы совпадений без данных вакансий — то, что хранится в FSM
+    """
+    return [
+        {
+            "id": v.get("id"),
+            "_rank": v.get("_rank", rank),
+            "_matched_skills": list(v.get("_matched_skills") or []),
+            "_match_count": v.get("_match_count", 0),
+            "_duplicates_count": v.get("_duplicates_count", 0),
+        }
+        for rank, v in enumerate(vacancies)
+    ]
+
+
+def add_skill(vacancies: List[dict], skill: str, texts: Optional[List[str]] = None) -> List[dict]:
+    """
+    Дельта при добавлении навыка: проверяется только новый столбец матрицы.
+    texts — тексты вакансий (vacancy_text) в том же порядке, если в строках
+    хранятся только совпадения.
+    """
+    skill = skill.lower()
+    for i, v in enumerate(vacancies):
+        text = texts[i] if texts is not None else vacancy_text(v)
+        if skill in text:
+            v.setdefault("_matched_skills", []).append(skill)
+            v["_match_count"] = v.get("_match_count", 0) + 1
+    return vacancies
+
+
+def remove_skill(vacancies: List[dict], skill: str) -> List[dict]:
+    """
+    Дельта при удалении навыка: столбец убирается из строк, где он совпал
+    """
+    skill = skill.lower()
+    for v in vacancies:
+        matched = v.get("_matched_skills") or []
+        if skill in matched:
+            matched.remove(skill)
+            v["_match_count"] = len(matched)
+    return vacancies
+
+
+# --- Столбцы для сортировки ---
+
+SORT_MODES = ("match", "salary", "date", "combined")
+DEFAULT_SORT_MODE = "match"
+
+# Примерные курсы к рублю; для сравнения зарплат точность курса не важна
+CURRENCY_RATES = {
+    "RUR": 1.0,
+    "RUB": 1.0,
+    "USD": 90.0,
+    "EUR": 98.0,
+    "KZT": 0.18,
+    "UZS": 0.0072,
+    "BYR": 28.0,
+    "BYN": 28.0,
+    "UAH": 2.2,
+    "KGS": 1.05,
+    "AZN": 53.0,
+    "GEL": 33.0,
+}
+
+# Веса составного режима: совпадения, зарплата, свежесть
+COMBINED_WEIGHTS = (0.6, 0.25, 0.15)
+
+
+def salary_rub(salary: Optional[dict]) -> float:
+    """
+    Зарплата в рублях: середина вилки или единственная указанная граница.
+    0, если зарплата не указана или валюта неизвестна.
+    """
+    if not salary:
+        return 0.0
+    low, high = salary.get("from"), salary.get("to")
+    if low and high:
+        amount = (low + high) / 2
+    else:
+        amount = low or high
+    rate = CURRENCY_RATES.get(salary.get("currency") or "RUR")
+    if not amount or rate is None:
+        return 0.0
+    return float(amount) * rate
+
+
+def published_ts(published_at: Optional[str]) -> float:
+    if not published_at:
+        return 0.0
+    try:
+        return datetime.datetime.strptime(published_at, "%Y-%m-%dT%H:%M:%S%z").timestamp()
+    except ValueError:
+        try:
+            return datetime.datetime.fromisoformat(published_at.replace("Z", "+00:00")).timestamp()
+        except ValueError:
+            return 0.0
+
+
+def build_columns(vacancies: List[dict]) -> Dict[str, list]:
+    """
+    Нормализует выдачу один раз в параллельные столбцы, индекс i — vacancies[i]
+    """
+    return {
+        "score": [v.get("_match_count", 0) for v in vacancies],
+        "salary": [salary_rub(v.get("salary")) for v in vacancies],
+        "published": [published_ts(v.get("published_at")) for v in vacancies],
+    }
+
+
+def refresh_scores(columns: Dict[str, list], vacancies: List[dict]) -> None:
+    """
+    Обновляет столбец совпадений после дельты по навыкам
+    """
+    columns["score"] = [v.get("_match_count", 0) for v in vacancies]
+
+
+def _combined_keys(columns: Dict[str, list]) -> List[float]:
+    scores, salaries, published = columns["score"], columns["salary"], columns["published"]
+    max_score = max(scores, default=0) or 1
+    max_salary = max(salaries, default=0) or 1
+    dated = [ts for ts in published if ts]
+    oldest = min(dated, default=0)
+    span = (max(dated, default=0) - oldest) or 1
+    w_score, w_salary, w_fresh = COMBINED_WEIGHTS
+    return [
+        w_score * scores[i] / max_score
+        + w_salary * salaries[i] / max_salary
+        + (w_fresh * (published[i] - oldest) / span if published[i] else 0.0)
+        for i in range(len(scores))
+    ]
+
+
+def order_by(columns: Dict[str, list], mode: str = DEFAULT_SORT_MODE, top_k: Optional[int] = None) -> List[int]:
+    """
+    Индексы вакансий в порядке режима сортировки, по убыванию.
+    При равенстве сохраняется порядок выдачи hh.ru. С top_k возвращаются
+    только k лучших (частичный отбор через кучу вместо полной сортировки).
+    """
+    scores = columns["score"]
+    if mode == "salary":
+        salaries = columns["salary"]
+        key = lambda i: (salaries[i], scores[i], -i)
+    elif mode == "date":
+        published = columns["published"]
+        key = lambda i: (published[i], scores[i], -i)
+    elif mode == "combined":
+        combined = _combined_keys(columns)
+        key = lambda i: (combined[i], -i)
+    else:
+        key = lambda i: (scores[i], -i)
+    indices = range(len(scores))
+    if top_k is not None and top_k < len(scores):
+        return heapq.nlargest(top_k, indices, key=key)
+    return sorted(indices, key=key, reverse=True)
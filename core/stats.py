@@ -0,0 +1,289 @@
+# core/stats.py
+"""
+Статистика использования бота.
+
+Счётчики и гистограммы задержек обновляются прямо в хэндлерах обычными
+операциями со словарями — без блокировок, так как весь учёт идёт из
+event loop. Фоновая задача раз в STATS_FLUSH_SECONDS пакетно сохраняет
+накопленное на диск и пересчитывает снимок, который читают кнопка
+«Статистика» и команда /stats — сами они ничего не пересчитывают.
+
+Популярные навыки считаются приближённо алгоритмом Space-Saving:
+память ограничена TOP_SKILLS_CAPACITY, а частые навыки гарантированно
+остаются в таблице.
+
+В многопроцессном режиме (bot/supervisor.py) каждый воркер пишет свой
+файл, а STATS_SHARDS_GLOB указывает на файлы всех воркеров: снимок
+складывает их с собственными счётчиками, поэтому любой воркер
+показывает общую статистику (с задержкой до STATS_FLUSH_SECONDS).
+"""
+import asyncio
+import glob
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+STATS_PATH = Path(os.getenv("STATS_PATH", "data/stats.json"))
+STATS_SHARDS_GLOB = os.getenv("STATS_SHARDS_GLOB")
+STATS_FLUSH_SECONDS = 30
+TOP_SKILLS_CAPACITY = 200
+# Верхние границы корзин гистограммы задержек, мс
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+class SpaceSaving:
+    """
+    Приближённый подсчёт самых частых элементов потока в фиксированной памяти.
+    Оценка частоты завышена не более чем на errors[item].
+    """
+
+    def __init__(self, capacity: int = TOP_SKILLS_CAPACITY):
+        self.capacity = capacity
+        self.counts: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+
+    def add(self, item: str, count: int = 1) -> None:
+        if item in self.counts:
+            self.counts[item] += count
+            return
+        if len(self.counts) < self.capacity:
+            self.counts[item] = count
+            self.errors[item] = 0
+            return
+        # Вытесняем самый редкий элемент, новый наследует его счёт как погрешность
+        victim = min(self.counts, key=self.counts.get)
+        floor = self.counts.pop(victim)
+        self.errors.pop(victim, None)
+        self.counts[item] = floor + count
+        self.errors[item] = floor
+
+    def merge(self, other: "SpaceSaving") -> None:
+        """
+        Слияние двух таблиц: счёты и погрешности складываются,
+        затем остаются capacity самых частых элементов
+        """
+        for item, count in other.counts.items():
+            self.counts[item] = self.counts.get(item, 0) + count
+            self.errors[item] = self.errors.get(item, 0) + other.errors.get(item, 0)
+        if len(self.counts) > self.capacity:
+            keep = sorted(self.counts, key=self.counts.get, reverse=True)[:self.capacity]
+            self.counts = {item: self.counts[item] for item in keep}
+            self.errors = {item: self.errors.get(item, 0) for item in keep}
+
+    def top(self, n: int = 10) -> List[Tuple[str, int]]:
+        return sorted(self.counts.items(), key=lambda x: x[1], reverse=True)[:n]
+
+    def to_dict(self) -> dict:
+        return {"capacity": self.capacity, "counts": self.counts, "errors": self.errors}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "SpaceSaving":
+        sketch = cls(data.get("capacity", TOP_SKILLS_CAPACITY))
+        sketch.counts = dict(data.get("counts", {}))
+        sketch.errors = dict(data.get("errors", {}))
+        return sketch
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def observe(self, seconds: float) -> None:
+        ms = seconds * 1000
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if ms <= bound:
+                self.buckets[i] += 1
+                return
+        self.buckets[-1] += 1
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        for i, n in enumerate(other.buckets):
+            self.buckets[i] += n
+
+    def percentile(self, q: float) -> float:
+        """
+        Верхняя граница корзины, в которую попадает q-й процентиль, мс
+        """
+        if not self.count:
+            return 0.0
+        rank = q / 100 * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank:
+                return float(LATENCY_BUCKETS_MS[i]) if i < len(LATENCY_BUCKETS_MS) else self.max
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {"count": self.count, "total": self.total, "max": self.max, "buckets": self.buckets}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "LatencyHistogram":
+        hist = cls()
+        hist.count = data.get("count", 0)
+        hist.total = data.get("total", 0.0)
+        hist.max = data.get("max", 0.0)
+        buckets = data.get("buckets") or []
+        if len(buckets) == len(hist.buckets):
+            hist.buckets = list(buckets)
+        return hist
+
+
+class UsageStats:
+    def __init__(self, path: Path = STATS_PATH, shards_glob: Optional[str] = STATS_SHARDS_GLOB):
+        self.path = path
+        self.shards_glob = shards_glob
+        self.counters: Dict[str, int] = {}
+        self.latencies: Dict[str, LatencyHistogram] = {}
+        self.top_skills = SpaceSaving()
+        self.snapshot: dict = {}
+        self.started_at = time.time()
+        self._dirty = False
+        self._task: Optional[asyncio.Task] = None
+
+    # --- Горячий путь: только операции со словарями ---
+
+    def incr(self, name: str, n: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + n
+        self._dirty = True
+
+    def observe(self, stage: str, seconds: float) -> None:
+        hist = self.latencies.get(stage)
+        if hist is None:
+            hist = self.latencies[stage] = LatencyHistogram()
+        hist.observe(seconds)
+        self._dirty = True
+
+    def add_skills(self, skills: Iterable[str]) -> None:
+        for skill in skills:
+            self.top_skills.add(skill.lower())
+        self._dirty = True
+
+    # --- Снимок и сохранение ---
+
+    def build_snapshot(self, shards: Iterable[dict] = ()) -> dict:
+        """
+        Снимок собственных счётчиков плюс сохранённые состояния других воркеров
+        """
+        counters = dict(self.counters)
+        latencies = {stage: LatencyHistogram.from_dict(hist.to_dict()) for stage, hist in self.latencies.items()}
+        top_skills = SpaceSaving.from_dict(self.top_skills.to_dict())
+        for shard in shards:
+            for name, n in shard.get("counters", {}).items():
+                counters[name] = counters.get(name, 0) + n
+            for stage, hist in shard.get("latencies", {}).items():
+                latencies.setdefault(stage, LatencyHistogram()).merge(LatencyHistogram.from_dict(hist))
+            top_skills.merge(SpaceSaving.from_dict(shard.get("top_skills", {})))
+        return {
+            "updated_at": time.time(),
+            "counters": counters,
+            "latency_ms": {
+                stage: {
+                    "count": hist.count,
+                    "avg": hist.total / hist.count if hist.count else 0.0,
+                    "p50": hist.percentile(50),
+                    "p95": hist.percentile(95),
+                    "max": hist.max,
+                }
+                for stage, hist in latencies.items()
+            },
+            "top_skills": top_skills.top(10),
+        }
+
+    def _read_shards(self) -> List[dict]:
+        """
+        Состояния других воркеров из их файлов (собственный файл пропускается)
+        """
+        if not self.shards_glob:
+            return []
+        own = self.path.resolve()
+        shards = []
+        for shard_path in sorted(glob.glob(self.shards_glob)):
+            if Path(shard_path).resolve() == own:
+                continue
+            try:
+                with open(shard_path, encoding="utf-8") as f:
+                    shards.append(json.load(f))
+            except Exception as e:
+                logger.warning("Не удалось прочитать статистику воркера %s: %s", shard_path, e)
+        return shards
+
+    def _state(self) -> dict:
+        return {
+            "counters": self.counters,
+            "latencies": {stage: hist.to_dict() for stage, hist in self.latencies.items()},
+            "top_skills": self.top_skills.to_dict(),
+        }
+
+    def load(self) -> None:
+        if self.path.exists():
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    data = json.load(f)
+                self.counters = dict(data.get("counters", {}))
+                self.latencies = {
+                    stage: LatencyHistogram.from_dict(hist)
+                    for stage, hist in data.get("latencies", {}).items()
+                }
+                self.top_skills = SpaceSaving.from_dict(data.get("top_skills", {}))
+            except Exception as e:
+                logger.error("Не удалось загрузить статистику из %s: %s", self.path, e)
+        self.snapshot = self.build_snapshot(self._read_shards())
+
+    @staticmethod
+    def _write(path: Path, payload: str) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(payload, encoding="utf-8")
+        os.replace(tmp_path, path)
+
+    async def flush(self) -> None:
+        """
+        Пересчитывает снимок и, если были изменения, сохраняет всё одним файлом
+        """
+        shards = await asyncio.to_thread(self._read_shards) if self.shards_glob else []
+        self.snapshot = self.build_snapshot(shards)
+        if not self._dirty:
+            return
+        self._dirty = False
+        # Сериализуем в event loop, чтобы не читать словари из другого потока
+        payload = json.dumps(self._state(), ensure_ascii=False)
+        try:
+            await asyncio.to_thread(self._write, self.path, payload)
+        except Exception as e:
+            self._dirty = True
+            logger.error("Не удалось сохранить статистику: %s", e)
+
+    async def _flush_loop(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            await self.flush()
+
+    def start(self, interval: float = STATS_FLUSH_SECONDS) -> None:
+        self.load()
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop(interval))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+
+usage_stats = UsageStats()
@@ -0,0 +1,276 @@
+# loadtest/harness.py
+"""
+Нагрузочный прогон бота без Telegram и без настоящего hh.ru.
+
+N симулированных пользователей параллельно проходят сценарий
+«загрузка PDF → поиск вакансий → следующая страница». Синтетические
+апдейты подаются напрямую в aiogram Dispatcher, а Bot работает через
+фейковую сессию, которая отвечает на методы API и отдаёт PDF при скачивании.
+Запросы к hh.ru уходят на локальный стенд loadtest.mock_hh.
+
+Запуск:
+    python -m loadtest.harness --users 50 --iterations 2 --latency-ms 150 --rate-429 0.05
+"""
+import argparse
+import asyncio
+import itertools
+import logging
+import math
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List
+
+from aiogram import Bot, Dispatcher
+from aiogram.client.session.base import BaseSession
+from aiogram.types import Update
+
+from core.log import setup_logging
+from loadtest.mock_hh import MockHH, start_mock
+
+logger = logging.getLogger(__name__)
+
+FAKE_TOKEN = "123456:LOADTEST-TOKEN"
+SAMPLE_RESUME_TEXT = (
+    "Python developer. Skills: Python, Django, PostgreSQL, Docker, Git, SQL, Linux. "
+    "Опыт работы с FastAPI, Redis, Kubernetes."
+)
+
+
+def make_sample_pdf(text: str) -> bytes:
+    """
+    Минимальный одностраничный PDF с текстовым слоем
+    """
+    safe = text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    stream = f"BT /F1 10 Tf 40 800 Td ({safe}) Tj ET".encode("latin-1", "replace")
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+        b"/Resources << /Font << /F1 5 0 R >> >> /Contents 4 0 R >>",
+        b"<< /Length " + str(len(stream)).encode() + b" >>\nstream\n" + stream + b"\nendstream",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{i} 0 obj\n".encode() + obj + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for off in offsets:
+        out += f"{off:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+class FakeSession(BaseSession):
+    """
+    Сессия Bot, которая не ходит в Telegram: методы отправки возвращают
+    синтетические сообщения, а скачивание файла отдаёт заданный PDF.
+    """
+
+    def __init__(self, pdf_bytes: bytes, api_latency_ms: float = 0, **kwargs):
+        super().__init__(**kwargs)
+        self.pdf_bytes = pdf_bytes
+        self.api_latency_ms = api_latency_ms
+        self.calls = defaultdict(int)
+        self._message_ids = itertools.count(1_000_000)
+
+    def _message(self, bot: Bot, chat_id, text=None, message_id=None):
+        return _validate({
+            "message_id": message_id or next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "text": text,
+        }, bot, "Message")
+
+    async def make_request(self, bot: Bot, method, timeout=None):
+        name = type(method).__name__
+        self.calls[name] += 1
+        if self.api_latency_ms:
+            await asyncio.sleep(self.api_latency_ms / 1000)
+        if name == "SendMessage":
+            return self._message(bot, method.chat_id, method.text)
+        if name == "EditMessageText":
+            return self._message(bot, method.chat_id, method.text, message_id=method.message_id)
+        if name == "GetFile":
+            return _validate({
+                "file_id": method.file_id,
+                "file_unique_id": method.file_id,
+                "file_path": f"documents/{method.file_id}.pdf",
+            }, bot, "File")
+        return True
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        for i in range(0, len(self.pdf_bytes), chunk_size):
+            yield self.pdf_bytes[i:i + chunk_size]
+
+    async def close(self):
+        pass
+
+
+def _validate(data: dict, bot: Bot, type_name: str):
+    from aiogram import types
+    return getattr(types, type_name).model_validate(data, context={"bot": bot})
+
+
+_update_ids = itertools.count(1)
+
+
+def _user(user_id: int) -> dict:
+    return {"id": user_id, "is_bot": False, "first_name": f"load{user_id}"}
+
+
+def document_update(user_id: int, pdf_size: int) -> dict:
+    return {
+        "update_id": next(_update_ids),
+        "message": {
+            "message_id": next(_update_ids),
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": _user(user_id),
+            "document": {
+                "file_id": f"resume-{user_id}",
+                "file_unique_id": f"resume-{user_id}",
+                "file_name": "resume.pdf",
+                "mime_type": "application/pdf",
+                "file_size": pdf_size,
+            },
+        },
+    }
+
+
+def callback_update(user_id: int, data: str) -> dict:
+    return {
+        "update_id": next(_update_ids),
+        "callback_query": {
+            "id": str(next(_update_ids)),
+            "from": _user(user_id),
+            "chat_instance": str(user_id),
+            "data": data,
+            "message": {
+                "message_id": next(_update_ids),
+                "date": int(time.time()),
+                "chat": {"id": user_id, "type": "private"},
+                "text": "...",
+            },
+        },
+    }
+
+
+def build_dispatcher() -> Dispatcher:
+    """
+    Dispatcher с теми же роутерами, что и в bot/main.py
+    """
+    from bot.handlers.callbacks import router as callbacks_router
+    from bot.handlers.profile import router as profile_router
+    from bot.handlers.resume import router as resume_router
+    from bot.middlewares import TraceIdMiddleware
+    dp = Dispatcher()
+    dp.update.outer_middleware(TraceIdMiddleware())
+    dp.include_router(callbacks_router)
+    dp.include_router(profile_router)
+    dp.include_router(resume_router)
+    return dp
+
+
+class LoadReport:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    def record(self, flow: str, seconds: float, ok: bool) -> None:
+        self.latencies[flow].append(seconds)
+        if not ok:
+            self.errors[flow] += 1
+
+    @staticmethod
+    def percentile(values: List[float], q: float) -> float:
+        if not values:
+            return 0.0
+        ordered = sorted(values)
+        idx = min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))
+        return ordered[idx]
+
+    def format(self, elapsed: float) -> str:
+        lines = [
+            f"{'сценарий':<10} {'кол-во':>7} {'ошибок':>7} {'в сек':>8} {'p50 мс':>9} {'p95 мс':>9} {'p99 мс':>9}",
+        ]
+        total = 0
+        for flow, values in self.latencies.items():
+            total += len(values)
+            lines.append(
+                f"{flow:<10} {len(values):>7} {self.errors[flow]:>7} {len(values) / elapsed:>8.1f} "
+                f"{self.percentile(values, 50) * 1000:>9.1f} {self.percentile(values, 95) * 1000:>9.1f} "
+                f"{self.percentile(values, 99) * 1000:>9.1f}"
+            )
+        lines.append(f"Всего апдейтов: {total} за {elapsed:.1f} с ({total / elapsed:.1f} в сек)")
+        return "\n".join(lines)
+
+
+async def _feed(dp: Dispatcher, bot: Bot, report: LoadReport, flow: str, data: dict) -> None:
+    update = Update.model_validate(data, context={"bot": bot})
+    started = time.perf_counter()
+    ok = True
+    try:
+        await dp.feed_update(bot, update)
+    except Exception as e:
+        ok = False
+        logger.error("Сценарий %s завершился ошибкой: %s", flow, e)
+    report.record(flow, time.perf_counter() - started, ok)
+
+
+async def simulate_user(dp: Dispatcher, bot: Bot, report: LoadReport, user_id: int,
+                        pdf_size: int, iterations: int) -> None:
+    for _ in range(iterations):
+        await _feed(dp, bot, report, "upload", document_update(user_id, pdf_size))
+        await _feed(dp, bot, report, "search", callback_update(user_id, "search_jobs"))
+        await _feed(dp, bot, report, "more", callback_update(user_id, "more_jobs:1"))
+        await _feed(dp, bot, report, "sort", callback_update(user_id, "sort_jobs:salary"))
+
+
+async def run(users: int, iterations: int, mock: MockHH, port: int, pdf_bytes: bytes,
+              api_latency_ms: float) -> LoadReport:
+    from core.fetchers import hh
+    runner = await start_mock(mock, port=port)
+    hh.HH_API_URL = f"http://127.0.0.1:{port}"
+    bot = Bot(token=FAKE_TOKEN, session=FakeSession(pdf_bytes, api_latency_ms=api_latency_ms))
+    dp = build_dispatcher()
+    report = LoadReport()
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(
+            simulate_user(dp, bot, report, 100_000 + i, len(pdf_bytes), iterations)
+            for i in range(users)
+        ))
+    finally:
+        await runner.cleanup()
+    elapsed = time.perf_counter() - started
+    print(report.format(elapsed))
+    print(f"Запросов к стенду hh.ru: {mock.requests}; вызовов Bot API: {dict(bot.session.calls)}")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон бота на локальном стенде")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--iterations", type=int, default=1)
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--pdf", type=Path, help="PDF-резюме; по умолчанию генерируется простой образец")
+    parser.add_argument("--latency-ms", type=float, default=100, help="задержка стенда hh.ru")
+    parser.add_argument("--jitter-ms", type=float, default=30)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--api-latency-ms", type=float, default=0, help="задержка фейкового Bot API")
+    args = parser.parse_args()
+
+    setup_logging(level="WARNING", debug_sample=0)
+    pdf_bytes = args.pdf.read_bytes() if args.pdf else make_sample_pdf(SAMPLE_RESUME_TEXT)
+    mock = MockHH(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                  error_rate=args.error_rate, rate_429=args.rate_429, seed=42)
+    asyncio.run(run(args.users, args.iterations, mock, args.port, pdf_bytes, args.api_latency_ms))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+# loadtest/mock_hh.py
+"""
+Локальный стенд API hh.ru для нагрузочного тестирования.
+
+Отдаёт записанные ответы /vacancies и /vacancies/{id} из loadtest/data
+с настраиваемой задержкой и долей ошибок 5xx и 429.
+
+Запуск:
+    python -m loadtest.mock_hh serve --port 8080 --latency-ms 150 --error-rate 0.01 --rate-429 0.05
+    python -m loadtest.mock_hh record "python django" --pages 2
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import random
+from pathlib import Path
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(__file__).parent / "data"
+
+
+class MockHH:
+    def __init__(self, data_dir: Path = DATA_DIR, latency_ms: float = 100, jitter_ms: float = 50,
+                 error_rate: float = 0.0, rate_429: float = 0.0, seed: int = None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_429 = rate_429
+        self.random = random.Random(seed)
+        self.search_pages = []
+        self.details = {}
+        self.requests = 0
+        self._load(data_dir)
+
+    def _load(self, data_dir: Path) -> None:
+        for path in sorted(data_dir.glob("*.json")):
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            if path.name.startswith("vacancy_"):
+                self.details[str(data["id"])] = data
+            elif "items" in data:
+                self.search_pages.append(data)
+        if not self.search_pages:
+            raise RuntimeError(f"В {data_dir} нет записанных ответов /vacancies")
+        # Для вакансий без записанной карточки собираем её из сниппета
+        for page in self.search_pages:
+            for item in page["items"]:
+                if item["id"] in self.details:
+                    continue
+                snippet = item.get("snippet") or {}
+                self.details[item["id"]] = dict(
+                    item,
+                    key_skills=[],
+                    description=f"<p>{snippet.get('requirement') or ''}</p><p>{snippet.get('responsibility') or ''}</p>",
+                )
+        logger.info("Загружено страниц выдачи: %s, карточек: %s", len(self.search_pages), len(self.details))
+
+    async def _simulate(self):
+        """
+        Задержка и случайные сбои; возвращает ответ-ошибку или None
+        """
+        self.requests += 1
+        delay = max(0.0, self.random.gauss(self.latency_ms, self.jitter_ms)) / 1000
+        await asyncio.sleep(delay)
+        roll = self.random.random()
+        if roll < self.rate_429:
+            return web.json_response({"errors": [{"type": "too_many_requests"}]}, status=429, headers={"Retry-After": "1"})
+        if roll < self.rate_429 + self.error_rate:
+            return web.json_response({"errors": [{"type": "internal"}]}, status=503)
+        return None
+
+    async def vacancies(self, request: web.Request) -> web.Response:
+        error = await self._simulate()
+        if error is not None:
+            return error
+        # Один и тот же текст запроса всегда получает одну и ту же запись
+        text = request.query.get("text", "")
+        idx = int(hashlib.md5(text.encode()).hexdigest(), 16) % len(self.search_pages)
+        page = self.search_pages[idx]
+        per_page = int(request.query.get("per_page", 20))
+        return web.json_response(dict(page, items=page["items"][:per_page], per_page=per_page))
+
+    async def vacancy(self, request: web.Request) -> web.Response:
+        error = await self._simulate()
+        if error is not None:
+            return error
+        vac_id = request.match_info["vac_id"]
+        data = self.details.get(vac_id)
+        if data is None:
+            return web.json_response({"errors": [{"type": "not_found"}]}, status=404)
+        etag = '"' + hashlib.md5(vac_id.encode()).hexdigest() + '"'
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+        return web.json_response(data, headers={"ETag": etag})
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/vacancies", self.vacancies)
+        app.router.add_get("/vacancies/{vac_id}", self.vacancy)
+        return app
+
+
+async def start_mock(mock: MockHH, host: str = "127.0.0.1", port: int = 8080) -> web.AppRunner:
+    runner = web.AppRunner(mock.make_app())
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info("Стенд hh.ru запущен на http://%s:%s", host, port)
+    return runner
+
+
+async def record(query: str, pages: int = 1, per_page: int = 50, data_dir: Path = DATA_DIR) -> None:
+    """
+    Сохраняет настоящие ответы hh.ru для последующего воспроизведения
+    """
+    import httpx
+    async with httpx.AsyncClient() as client:
+        for page in range(pages):
+            resp = await client.get("https://api.hh.ru/vacancies", params={
+                "text": query, "area": 113, "per_page": per_page, "page": page, "order_by": "relevance",
+            })
+            resp.raise_for_status()
+            slug = hashlib.md5(query.encode()).hexdigest()[:8]
+            path = data_dir / f"search_{slug}_{page}.json"
+            path.write_text(json.dumps(resp.json(), ensure_ascii=False), encoding="utf-8")
+            print(f"Сохранено: {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Локальный стенд API hh.ru")
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve = sub.add_parser("serve")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8080)
+    serve.add_argument("--latency-ms", type=float, default=100)
+    serve.add_argument("--jitter-ms", type=float, default=50)
+    serve.add_argument("--error-rate", type=float, default=0.0)
+    serve.add_argument("--rate-429", type=float, default=0.0)
+    rec = sub.add_parser("record")
+    rec.add_argument("query")
+    rec.add_argument("--pages", type=int, default=1)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "record":
+        asyncio.run(record(args.query, pages=args.pages))
+        return
+    mock = MockHH(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                  error_rate=args.error_rate, rate_429=args.rate_429)
+    web.run_app(mock.make_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+import asyncio
+
+import pytest
+
+from bot.admission import AdmissionRejected, ResumeAdmission
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_admits_immediately_below_limit():
+    async def scenario():
+        admission = ResumeAdmission(max_concurrent=2)
+        await admission.acquire(1)
+        await admission.acquire(2)
+        assert admission.active == 2
+        admission.release(1)
+        admission.release(2)
+        assert admission.active == 0
+        assert not admission._per_user
+
+    run(scenario())
+
+
+def test_per_user_cap():
+    async def scenario():
+        admission = ResumeAdmission(max_concurrent=4, max_per_user=1)
+        await admission.acquire(1)
+        with pytest.raises(AdmissionRejected):
+            await admission.acquire(1)
+        admission.release(1)
+        await admission.acquire(1)
+        assert admission.active == 1
+
+    run(scenario())
+
+
+def test_per_user_cap_counts_queued_tickets():
+    async def scenario():
+        admission = ResumeAdmission(max_concurrent=1, max_per_user=1)
+        await admission.acquire(1)
+        waiter = asyncio.create_task(admission.acquire(2))
+        await settle()
+        with pytest.raises(AdmissionRejected):
+            await admission.acquire(2)
+        waiter.cancel()
+        await settle()
+
+    run(scenario())
+
+
+def test_rejects_when_queue_is_full():
+    async def scenario():
+        admission = ResumeAdmission(max_concurrent=1, max_queued=1)
+        await admission.acquire(1)
+        waiter = asyncio.create_task(admission.acquire(2))
+        await settle()
+        with pytest.raises(AdmissionRejected):
+            await admission.acquire(3)
+        assert 3 not in admission._per_user
+        waiter.cancel()
+        await settle()
+
+    run(scenario())
+
+
+def test_slot_handoff_is_fifo():
+    async def scenario():
+        admission = ResumeAdmission(max_concurrent=1)
+        order = []
+
+        async def user(user_id):
+            await admission.acquire(user_id)
+            order.append(user_id)
+
+        await admission.acquire(1)
+        waiters = [asyncio.create_task(user(i)) for i in (2, 3)]
+        await settle()
+        assert admission.queued == 2
+        admission.release(1)
+        await settle()
+        assert order == [2]
+        assert admission.active == 1
+        admission.release(2)
+        await settle()
+        assert order == [2, 3]
+        assert admission.active == 1
+        admission.release(3)
+        assert admission.active == 0
+        await asyncio.gather(*waiters)
+
+    run(scenario())
+
+
+def test_cancelled_waiter_leaves_queue():
+    async def scenario():
+        admission = ResumeAdmission(max_concurrent=1)
+        positions = []
+
+        async def on_position(position):
+            positions.append(position)
+
+        await admission.acquire(1)
+        cancelled = asyncio.create_task(admission.acquire(2))
+        await settle()
+        waiter = asyncio.create_task(admission.acquire(3, on_position))
+        await settle()
+        assert positions == [2]
+        cancelled.cancel()
+        await settle()
+        assert admission.queued == 1
+        assert 2 not in admission._per_user
+        assert positions == [2, 1]
+        admission.release(1)
+        await waiter
+        assert admission.active == 1
+
+    run(scenario())
+
+
+def test_cancel_after_grant_passes_slot_on():
+    async def scenario():
+        admission = ResumeAdmission(max_concurrent=1)
+        await admission.acquire(1)
+        granted = asyncio.create_task(admission.acquire(2))
+        await settle()
+        following = asyncio.create_task(admission.acquire(3))
+        await settle()
+        # Слот передан заявке 2, но её задачу отменили раньше, чем она проснулась
+        admission.release(1)
+        granted.cancel()
+        await settle()
+        assert granted.cancelled()
+        assert following.done()
+        assert admission.active == 1
+        assert admission._per_user == {3: 1}
+
+    run(scenario())
+
+
+def test_stale_position_update_cancelled_on_admission():
+    async def scenario():
+        admission = ResumeAdmission(max_concurrent=1)
+        delivered = []
+
+        async def slow_position(position):
+            await asyncio.sleep(0.05)
+            delivered.append(position)
+
+        await admission.acquire(1)
+        waiter = asyncio.create_task(admission.acquire(2, slow_position))
+        await settle()
+        admission.release(1)
+        await waiter
+        await asyncio.sleep(0.1)
+        assert delivered == []
+
+    run(scenario())
+
+
+def test_slot_context_manager_releases_on_error():
+    async def scenario():
+        admission = ResumeAdmission(max_concurrent=1)
+        with pytest.raises(RuntimeError):
+            async with admission.slot(1):
+                raise RuntimeError
+        assert admission.active == 0
+        assert not admission._per_user
+
+    run(scenario())
+
+
+def test_check_file_size():
+    admission = ResumeAdmission(max_file_size=1024)
+    admission.check_file_size(1024)
+    admission.check_file_size(None)
+    with pytest.raises(AdmissionRejected):
+        admission.check_file_size(1025)
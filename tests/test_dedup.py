@@ -0,0 +1,81 @@
+import copy
+
+from core import dedup
+from core.fetchers.hh import VacancyCache
+
+
+def make_vacancy(vac_id, name, employer, requirement, responsibility):
+    return {
+        "id": vac_id,
+        "name": name,
+        "employer": {"id": employer, "name": employer},
+        "snippet": {"requirement": requirement, "responsibility": responsibility},
+    }
+
+
+BASE = make_vacancy(
+    "1",
+    "Python-разработчик",
+    "Яндекс",
+    "Опыт коммерческой разработки на <highlighttext>Python</highlighttext> от 3 лет. Знание Django, PostgreSQL.",
+    "Разработка и поддержка сервисов, участие в code review.",
+)
+
+
+def test_lightly_edited_repost_collapses():
+    repost = copy.deepcopy(BASE)
+    repost["id"] = "2"
+    repost["snippet"]["requirement"] = "Опыт коммерческой разработки на Python от 3 лет. Знание Django, PostgreSQL, Redis."
+    unique = dedup.collapse_duplicates([copy.deepcopy(BASE), repost])
+    assert [v["id"] for v in unique] == ["1"]
+    assert unique[0]["_duplicates_count"] == 1
+
+
+def test_single_word_edits_collapse():
+    text = BASE["snippet"]["requirement"]
+    words = text.split()
+    edits = [
+        text + " Срочно.",
+        " ".join(words[:3] + words[4:]),
+        " ".join(words[:5] + ["новое"] + words[6:]),
+    ]
+    for i, requirement in enumerate(edits):
+        repost = copy.deepcopy(BASE)
+        repost["id"] = f"r{i}"
+        repost["snippet"]["requirement"] = requirement
+        assert len(dedup.collapse_duplicates([copy.deepcopy(BASE), repost])) == 1, requirement
+
+
+def test_other_vacancy_of_same_employer_with_template_text_is_kept():
+    # Работодатели часто используют одно описание для разных вакансий
+    other = copy.deepcopy(BASE)
+    other["id"] = "3"
+    other["name"] = "Frontend-разработчик React"
+    unique = dedup.collapse_duplicates([copy.deepcopy(BASE), other])
+    assert [v["id"] for v in unique] == ["1", "3"]
+
+
+def test_same_text_from_other_employer_is_kept():
+    other = copy.deepcopy(BASE)
+    other["id"] = "4"
+    other["employer"] = {"id": "Сбер", "name": "Сбер"}
+    assert len(dedup.collapse_duplicates([copy.deepcopy(BASE), other])) == 2
+
+
+def test_signature_is_cached():
+    cache = VacancyCache()
+    fingerprint, vac_shingles = dedup.vacancy_signature(BASE, cache)
+    assert cache.get_fingerprint("1") == fingerprint
+    assert cache.get_shingles("1") == vac_shingles
+    assert len(fingerprint) == dedup.NUM_PERM
+    # Повторный проход не пересчитывает шинглы
+    changed = dict(BASE, name="Другое название")
+    assert dedup.vacancy_signature(changed, cache) == (fingerprint, vac_shingles)
+
+
+def test_is_duplicate_pair():
+    repost = copy.deepcopy(BASE)
+    repost["id"] = "2"
+    assert dedup.is_duplicate(BASE, repost)
+    repost["employer"] = {"id": "Сбер", "name": "Сбер"}
+    assert not dedup.is_duplicate(BASE, repost)
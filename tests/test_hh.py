@@ -0,0 +1,62 @@
+from core.fetchers import hh
+from core.fetchers.hh import MAX_QUERIES, MAX_QUERY_LENGTH, plan_queries, select_skills
+
+
+def make_skills(n):
+    return [f"skill{i:02d}" for i in range(n)]
+
+
+def test_skills_fit_into_one_query():
+    for n in (2, 5, 6, 9, 12, 20):
+        queries = plan_queries(make_skills(n))
+        assert len(queries) == 1
+        assert queries[0].count(" OR ") == n - 1
+
+
+def test_split_only_when_length_is_exceeded():
+    skills = make_skills(60)
+    queries = plan_queries(skills)
+    assert 1 < len(queries) <= MAX_QUERIES
+    assert all(len(query) <= MAX_QUERY_LENGTH for query in queries)
+    # Все запросы, кроме последнего, заполнены: следующий навык в них не влез
+    term = len(hh._quote("skill00")) + len(" OR ")
+    assert all(len(query) + term > MAX_QUERY_LENGTH for query in queries[:-1])
+
+
+def test_query_count_is_capped():
+    skills = make_skills(200)
+    queries = plan_queries(skills)
+    assert len(queries) == MAX_QUERIES
+    selected = select_skills(skills)
+    assert len(selected) < len(skills)
+    assert sum(query.count('"') // 2 for query in queries) == len(selected)
+
+
+def test_weighty_skills_are_selected_first(monkeypatch):
+    monkeypatch.setattr(hh, "_get_skill_categories", lambda: {})
+    skills = {"soft_skills": [f"soft{i:03d}" for i in range(100)], "programming_languages": ["python", "go"]}
+    selected = select_skills(skills, max_queries=1)
+    assert selected[:2] == ["python", "go"]
+    assert len(plan_queries(skills, max_queries=1)) == 1
+
+
+def test_duplicates_and_overlong_skills_are_skipped():
+    assert select_skills(["Python", "python ", "x" * (MAX_QUERY_LENGTH + 1)]) == ["Python"]
+    assert plan_queries([]) == []
+
+
+def test_cache_keeps_items_without_user_fields():
+    cache = hh.VacancyCache()
+    cache.put_items([{"id": "1", "name": "Python developer", "_match_count": 3}, {"name": "no id"}])
+    assert cache.get_item("1") == {"id": "1", "name": "Python developer"}
+    assert len(cache) == 1
+
+
+def test_search_text_includes_card_and_is_rebuilt():
+    cache = hh.VacancyCache()
+    assert cache.search_text("1") is None
+    cache.put_items([{"id": "1", "name": "Backend developer", "snippet": {"requirement": "Python"}}])
+    assert "python" in cache.search_text("1") and "kafka" not in cache.search_text("1")
+    cache.put("1", {"key_skills": [{"name": "Kafka"}], "description": "<p>Redis</p>"})
+    text = cache.search_text("1")
+    assert "kafka" in text and "redis" in text and "<p>" not in text
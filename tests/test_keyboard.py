@@ -0,0 +1,77 @@
+from bot import keyboard
+from bot.keyboard import SKILLS_PER_PAGE, get_del_skill_keyboard, resolve_skill_callback, skill_token
+
+# У этих строк одинаковый CRC32
+COLLIDING = ("plumless", "buckeroo")
+
+
+def payload(skills, idx):
+    return f"{idx}:{skill_token(skills[idx])}"
+
+
+def skill_buttons(markup):
+    return [row[0] for row in markup.inline_keyboard if row[0].callback_data.startswith("del_skill:")]
+
+
+def test_resolve_by_index():
+    skills = ["python", "go", "sql"]
+    assert resolve_skill_callback(payload(skills, 1), skills) == "go"
+
+
+def test_resolve_after_list_changed():
+    skills = ["python", "go", "sql"]
+    data = payload(skills, 2)
+    assert resolve_skill_callback(data, ["go", "sql"]) == "sql"
+    assert resolve_skill_callback(data, ["python", "go"]) is None
+
+
+def test_colliding_tokens_resolved_by_index():
+    assert skill_token(COLLIDING[0]) == skill_token(COLLIDING[1])
+    skills = ["python", *COLLIDING]
+    assert resolve_skill_callback(payload(skills, 1), skills) == "plumless"
+    assert resolve_skill_callback(payload(skills, 2), skills) == "buckeroo"
+
+
+def test_colliding_tokens_with_stale_index_are_rejected():
+    skills = ["python", *COLLIDING]
+    data = payload(skills, 2)
+    # Список сдвинулся: по отпечатку подходят оба навыка, удалять наугад нельзя
+    assert resolve_skill_callback(data, list(COLLIDING)) is None
+    assert resolve_skill_callback(data, ["buckeroo"]) == "buckeroo"
+
+
+def test_legacy_payload_with_full_name():
+    assert resolve_skill_callback("Docker", ["Docker"]) == "Docker"
+    assert resolve_skill_callback("Kubernetes", ["Docker"]) is None
+
+
+def test_callback_data_fits_telegram_limit():
+    skills = ["очень длинное название навыка " * 5 + str(i) for i in range(SKILLS_PER_PAGE * 6)]
+    for page in range(6):
+        for row in get_del_skill_keyboard(skills, page).inline_keyboard:
+            for button in row:
+                assert len(button.callback_data.encode("utf-8")) <= 64
+                assert len(button.text) <= keyboard.SKILL_BUTTON_MAX_LEN + 2
+
+
+def test_pages_cover_all_skills_once():
+    skills = [f"skill{i}" for i in range(SKILLS_PER_PAGE * 2 + 3)]
+    seen = []
+    for page in range(3):
+        seen += [button.callback_data.split(":")[1] for button in skill_buttons(get_del_skill_keyboard(skills, page))]
+    assert seen == [str(i) for i in range(len(skills))]
+
+
+def test_page_out_of_range_is_clamped():
+    skills = [f"skill{i}" for i in range(SKILLS_PER_PAGE + 1)]
+    last = get_del_skill_keyboard(skills, 1)
+    assert get_del_skill_keyboard(skills, 99) == last
+    assert get_del_skill_keyboard(skills, -5) == get_del_skill_keyboard(skills, 0)
+    nav = last.inline_keyboard[-2]
+    assert [button.callback_data for button in nav] == ["del_page:0", "del_page:1"]
+
+
+def test_single_page_has_no_navigation():
+    markup = get_del_skill_keyboard(["python", "go"])
+    assert len(skill_buttons(markup)) == 2
+    assert not any(button.callback_data.startswith("del_page:") for row in markup.inline_keyboard for button in row)
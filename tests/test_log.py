@@ -0,0 +1,70 @@
+import io
+import json
+import logging
+import logging.handlers
+import queue
+
+from core.log import JsonFormatter, LocalQueueHandler, SamplingFilter
+
+
+def make_record(level, trace_id):
+    record = logging.LogRecord("core.test", level, __file__, 1, "msg", None, None)
+    record.trace_id = trace_id
+    return record
+
+
+def test_debug_sampled_below_min_level():
+    sampler = SamplingFilter({logging.DEBUG: 1.0}, min_level=logging.INFO)
+    assert sampler.filter(make_record(logging.DEBUG, "1-abc"))
+    assert sampler.filter(make_record(logging.INFO, "1-abc"))
+
+
+def test_other_levels_below_min_level_dropped():
+    sampler = SamplingFilter({logging.DEBUG: 1.0}, min_level=logging.WARNING)
+    assert not sampler.filter(make_record(logging.INFO, "1-abc"))
+    assert sampler.filter(make_record(logging.WARNING, "1-abc"))
+
+
+def test_sampling_is_per_trace():
+    sampler = SamplingFilter({logging.DEBUG: 0.3}, min_level=logging.INFO)
+    traces = [f"{i}-trace" for i in range(1000)]
+    kept = [t for t in traces if sampler.filter(make_record(logging.DEBUG, t))]
+    assert 200 < len(kept) < 400
+    # Решение для трассы не меняется от записи к записи
+    assert all(sampler.filter(make_record(logging.DEBUG, t)) for t in kept)
+
+
+def test_zero_rate_drops_debug():
+    sampler = SamplingFilter({logging.DEBUG: 0.0}, min_level=logging.INFO)
+    assert not sampler.filter(make_record(logging.DEBUG, "1-abc"))
+
+
+def test_exception_is_formatted_in_listener():
+    stream = io.StringIO()
+    output = logging.StreamHandler(stream)
+    output.setFormatter(JsonFormatter())
+    log_queue = queue.SimpleQueue()
+    handler = LocalQueueHandler(log_queue)
+    logger = logging.getLogger("core.test_log")
+    logger.addHandler(handler)
+    logger.propagate = False
+    try:
+        try:
+            raise ValueError("bad value")
+        except ValueError:
+            logger.exception("boom %s", 1)
+    finally:
+        logger.removeHandler(handler)
+        logger.propagate = True
+    record = log_queue.get_nowait()
+    # В очередь запись попадает неотформатированной
+    assert record.msg == "boom %s" and record.args == (1,)
+    assert record.exc_info is not None
+    listener = logging.handlers.QueueListener(log_queue, output)
+    log_queue.put(record)
+    listener.start()
+    listener.stop()
+    payload = json.loads(stream.getvalue())
+    assert payload["msg"] == "boom 1"
+    assert "ValueError: bad value" in payload["exc"]
+    assert "Traceback" not in payload["msg"]
@@ -0,0 +1,97 @@
+import json
+
+import pytest
+
+from core import pdf_calibrate, pdf_parser
+
+
+@pytest.fixture
+def backends(monkeypatch, tmp_path):
+    """
+    Подменяет движки фейковыми и сбрасывает выбор движка по умолчанию
+    """
+    calls = []
+    outputs = {}
+
+    def make(name):
+        def extract(path):
+            calls.append(name)
+            result = outputs.get(name, "")
+            if isinstance(result, Exception):
+                raise result
+            return result
+        return extract
+
+    monkeypatch.setattr(pdf_parser, "_BACKENDS", {name: make(name) for name in ("pdfminer", "pypdfium2", "pdftotext")})
+    monkeypatch.setattr(pdf_parser, "CALIBRATION_PATH", tmp_path / "pdf_backend.json")
+    monkeypatch.setattr(pdf_parser, "_default_loaded", False)
+    monkeypatch.setattr(pdf_parser, "_default_backend", None)
+    monkeypatch.delenv("PDF_BACKEND", raising=False)
+    return calls, outputs
+
+
+def test_default_order_skips_missing_backends(backends):
+    assert pdf_parser.backend_order() == ["pypdfium2", "pdftotext", "pdfminer"]
+
+
+def test_falls_back_on_error_and_empty_text(backends):
+    calls, outputs = backends
+    outputs.update(pypdfium2=RuntimeError("broken"), pdftotext="   ", pdfminer="Python  developer")
+    assert pdf_parser.pdf_to_text("resume.pdf") == "Python developer"
+    assert calls == ["pypdfium2", "pdftotext", "pdfminer"]
+
+
+def test_all_backends_fail(backends):
+    assert pdf_parser.pdf_to_text("resume.pdf") == ""
+
+
+def test_env_backend_goes_first(backends, monkeypatch):
+    monkeypatch.setenv("PDF_BACKEND", "pdfminer")
+    assert pdf_parser.backend_order() == ["pdfminer", "pypdfium2", "pdftotext"]
+
+
+def test_unknown_env_backend_is_ignored(backends, monkeypatch):
+    monkeypatch.setenv("PDF_BACKEND", "pymupdf")
+    assert pdf_parser.backend_order() == ["pypdfium2", "pdftotext", "pdfminer"]
+
+
+def test_calibration_file_sets_default(backends):
+    pdf_parser.CALIBRATION_PATH.write_text(json.dumps({"backend": "pdftotext"}), encoding="utf-8")
+    assert pdf_parser.backend_order()[0] == "pdftotext"
+
+
+def test_calibrate_prefers_coverage_then_speed(backends, monkeypatch):
+    calls, outputs = backends
+    # pypdfium2 самый быстрый, но не извлёк текст; из полных выбирается быстрейший
+    outputs.update(pypdfium2="", pdftotext="text", pdfminer="text")
+    timings = {"pypdfium2": 0.001, "pdftotext": 0.002, "pdfminer": 0.010}
+    clock = {"now": 0.0}
+
+    def extract_with(backend, path):
+        clock["now"] += timings[backend]
+        return outputs[backend]
+
+    monkeypatch.setattr(pdf_parser, "extract_with", extract_with)
+    monkeypatch.setattr(pdf_parser.time, "perf_counter", lambda: clock["now"])
+    report = pdf_parser.calibrate(["a.pdf", "b.pdf"], repeats=2)
+    assert report["backend"] == "pdftotext"
+    assert report["results"]["pypdfium2"]["extracted"] == 0
+    assert report["results"]["pdftotext"]["extracted"] == 2
+    assert json.loads(pdf_parser.CALIBRATION_PATH.read_text(encoding="utf-8"))["backend"] == "pdftotext"
+    # Сохранённый выбор подхватывается без перезапуска
+    assert pdf_parser.backend_order()[0] == "pdftotext"
+
+
+def test_calibrate_dry_run_does_not_save(backends):
+    calls, outputs = backends
+    outputs.update(pdfminer="text")
+    assert pdf_parser.calibrate(["a.pdf"], repeats=1, save=False)["backend"] == "pdfminer"
+    assert not pdf_parser.CALIBRATION_PATH.exists()
+
+
+def test_collect_pdfs(tmp_path):
+    (tmp_path / "nested").mkdir()
+    for name in ("b.pdf", "a.PDF", "notes.txt", "nested/c.pdf"):
+        (tmp_path / name).write_bytes(b"%PDF-1.4")
+    paths = pdf_calibrate._collect_pdfs([str(tmp_path), str(tmp_path / "a.PDF"), str(tmp_path / "notes.txt")])
+    assert paths == [str(tmp_path / "b.pdf"), str(tmp_path / "nested" / "c.pdf"), str(tmp_path / "a.PDF")]
@@ -0,0 +1,166 @@
+import asyncio
+
+import pytest
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from bot.handlers import resume
+from core import profiles
+from core.profiles import ProfileError, ProfileStore, export_profile, import_profile, make_profile
+
+
+def test_missing_profile_is_not_cached(tmp_path):
+    async def scenario():
+        path = tmp_path / "profiles.sqlite3"
+        first, second = ProfileStore(path), ProfileStore(path)
+        assert await first.get(1) is None
+        # Пользователь переехал на другой воркер и загрузил резюме там
+        second.remember(1, make_profile(["python"]))
+        await second.flush()
+        profile = await first.get(1)
+        await first.stop()
+        await second.stop()
+        return profile
+
+    assert asyncio.run(scenario())["skills"] == ["python"]
+
+
+def test_fresh_read_bypasses_cache(tmp_path):
+    async def scenario():
+        path = tmp_path / "profiles.sqlite3"
+        first, second = ProfileStore(path), ProfileStore(path)
+        second.remember(1, make_profile(["python"]))
+        await second.flush()
+        assert (await first.get(1))["skills"] == ["python"]
+        second.remember(1, make_profile(["python", "go"]))
+        await second.flush()
+        cached = await first.get(1)
+        fresh = await first.get(1, fresh=True)
+        await first.stop()
+        await second.stop()
+        return cached, fresh
+
+    cached, fresh = asyncio.run(scenario())
+    assert cached["skills"] == ["python"]
+    assert fresh["skills"] == ["python", "go"]
+
+
+def test_cached_profile_expires(tmp_path, monkeypatch):
+    async def scenario():
+        path = tmp_path / "profiles.sqlite3"
+        first, second = ProfileStore(path), ProfileStore(path)
+        second.remember(1, make_profile(["python"]))
+        await second.flush()
+        await first.get(1)
+        second.remember(1, make_profile(["go"]))
+        await second.flush()
+        monkeypatch.setattr(profiles, "PROFILE_CACHE_SECONDS", 0)
+        profile = await first.get(1)
+        await first.stop()
+        await second.stop()
+        return profile
+
+    assert asyncio.run(scenario())["skills"] == ["go"]
+
+
+def test_pending_changes_win_over_file(tmp_path):
+    async def scenario():
+        store = ProfileStore(tmp_path / "profiles.sqlite3")
+        store.remember(1, make_profile(["python"]))
+        profile = await store.get(1, fresh=True)
+        await store.stop()
+        return profile
+
+    assert asyncio.run(scenario())["skills"] == ["python"]
+
+
+def test_cleanup_removes_stale_profiles(tmp_path):
+    async def scenario():
+        path = tmp_path / "profiles.sqlite3"
+        store = ProfileStore(path)
+        store.remember(1, make_profile(["python"]))
+        await store.flush()
+        removed = await store.cleanup(max_age_days=-1)
+        other = ProfileStore(path)
+        profile = await other.get(1)
+        await other.stop()
+        await store.stop()
+        return removed, profile
+
+    assert asyncio.run(scenario()) == (1, None)
+
+
+def test_export_import_round_trip():
+    profile = make_profile(["Python", "Docker"], sort="salary", last_results=["1", "2"])
+    restored = import_profile(export_profile(profile))
+    assert restored["skills"] == ["Python", "Docker"]
+    assert restored["filters"] == {"sort": "salary"}
+    assert restored["last_results"] == ["1", "2"]
+
+
+@pytest.mark.parametrize("raw", [b"not json", b"[]", b'{"skills": 5}', b'{"skills": [1, 2]}'])
+def test_import_rejects_malformed(raw):
+    with pytest.raises(ProfileError):
+        import_profile(raw)
+
+
+class FakeUser:
+    id = 1
+
+
+def fsm_context():
+    return FSMContext(storage=MemoryStorage(), key=StorageKey(bot_id=1, chat_id=1, user_id=1))
+
+
+def test_newer_profile_replaces_stale_fsm(tmp_path, monkeypatch):
+    async def scenario():
+        path = tmp_path / "profiles.sqlite3"
+        here, elsewhere = ProfileStore(path), ProfileStore(path)
+        monkeypatch.setattr(resume, "profile_store", here)
+        state = fsm_context()
+        await state.update_data(user_skills=["python"], hh_vacancies=[{"id": "1"}])
+        await resume.save_profile(state, FakeUser)
+        # Пользователь поработал на другом воркере, здесь остался старый FSM
+        elsewhere.remember(1, make_profile(["python", "go"]))
+        await here.flush()
+        await elsewhere.flush()
+        skills = await resume.restore_profile(state, 1)
+        data = await state.get_data()
+        await here.stop()
+        await elsewhere.stop()
+        return skills, data
+
+    skills, data = asyncio.run(scenario())
+    assert skills == ["python", "go"]
+    assert data["user_skills"] == ["python", "go"]
+    assert "hh_vacancies" not in data
+
+
+def test_fsm_in_sync_with_profile_is_kept(tmp_path, monkeypatch):
+    async def scenario():
+        store = ProfileStore(tmp_path / "profiles.sqlite3")
+        monkeypatch.setattr(resume, "profile_store", store)
+        state = fsm_context()
+        await state.update_data(user_skills=["python"], hh_vacancies=[{"id": "1"}])
+        await resume.save_profile(state, FakeUser)
+        await store.flush()
+        skills = await resume.restore_profile(state, 1)
+        data = await state.get_data()
+        await store.stop()
+        return skills, data
+
+    skills, data = asyncio.run(scenario())
+    assert skills == ["python"]
+    assert data["hh_vacancies"] == [{"id": "1"}]
+
+
+def test_empty_fsm_and_no_profile(tmp_path, monkeypatch):
+    async def scenario():
+        store = ProfileStore(tmp_path / "profiles.sqlite3")
+        monkeypatch.setattr(resume, "profile_store", store)
+        skills = await resume.restore_profile(fsm_context(), 1)
+        await store.stop()
+        return skills
+
+    assert asyncio.run(scenario()) is None
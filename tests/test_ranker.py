@@ -0,0 +1,127 @@
+import copy
+
+from core import ranker
+
+
+def make_vacancy(vac_id, name, requirement="", **extra):
+    return dict({"id": vac_id, "name": name, "snippet": {"requirement": requirement}}, **extra)
+
+
+VACANCIES = [
+    make_vacancy("1", "Python developer", "Django, PostgreSQL"),
+    make_vacancy("2", "Go developer", "Kafka, PostgreSQL"),
+    make_vacancy("3", "Frontend developer", "React, TypeScript"),
+]
+
+
+def test_match_matrix_keeps_order():
+    vacancies = ranker.build_match_matrix(copy.deepcopy(VACANCIES), ["Python", "PostgreSQL"])
+    assert [v["id"] for v in vacancies] == ["1", "2", "3"]
+    assert [v["_rank"] for v in vacancies] == [0, 1, 2]
+    assert [v["_matched_skills"] for v in vacancies] == [["python", "postgresql"], ["postgresql"], []]
+    assert [v["_match_count"] for v in vacancies] == [2, 1, 0]
+    assert all("_search_text" not in v for v in vacancies)
+
+
+def test_card_fields_count_as_text():
+    vac = make_vacancy("1", "Backend developer", key_skills=["Kafka"], description="<strong>Redis</strong>")
+    # Теги описания не считаются текстом вакансии
+    ranker.build_match_matrix([vac], ["kafka", "redis", "strong"])
+    assert vac["_matched_skills"] == ["kafka", "redis"]
+
+
+def test_add_and_remove_skill_match_full_rebuild():
+    skills = ["python", "postgresql"]
+    incremental = ranker.build_match_matrix(copy.deepcopy(VACANCIES), skills)
+    ranker.add_skill(incremental, "React")
+    ranker.remove_skill(incremental, "Python")
+    full = ranker.build_match_matrix(copy.deepcopy(VACANCIES), ["postgresql", "react"])
+    for got, expected in zip(incremental, full):
+        assert sorted(got["_matched_skills"]) == sorted(expected["_matched_skills"])
+        assert got["_match_count"] == expected["_match_count"]
+
+
+def test_add_skill_on_match_rows_uses_given_texts():
+    rows = ranker.match_rows(ranker.build_match_matrix(copy.deepcopy(VACANCIES), ["python"]))
+    assert set(rows[0]) == {"id", "_rank", "_matched_skills", "_match_count", "_duplicates_count"}
+    texts = [ranker.vacancy_text(v) for v in VACANCIES]
+    ranker.add_skill(rows, "kafka", texts)
+    assert [row["_match_count"] for row in rows] == [1, 1, 0]
+    assert rows[1]["_matched_skills"] == ["kafka"]
+
+
+def test_remove_unmatched_skill_is_noop():
+    vacancies = ranker.build_match_matrix(copy.deepcopy(VACANCIES), ["python"])
+    ranker.remove_skill(vacancies, "rust")
+    assert [v["_match_count"] for v in vacancies] == [1, 0, 0]
+
+
+def columns_of(scores, salaries, published):
+    return {"score": scores, "salary": salaries, "published": published}
+
+
+def test_salary_rub():
+    assert ranker.salary_rub(None) == 0.0
+    assert ranker.salary_rub({"from": 100000, "to": 200000, "currency": "RUR"}) == 150000
+    assert ranker.salary_rub({"from": 1000, "to": None, "currency": "USD"}) == 1000 * ranker.CURRENCY_RATES["USD"]
+    assert ranker.salary_rub({"from": None, "to": 500000, "currency": "KZT"}) == 500000 * ranker.CURRENCY_RATES["KZT"]
+    assert ranker.salary_rub({"from": 100000}) == 100000
+    assert ranker.salary_rub({"from": 100, "currency": "XXX"}) == 0.0
+    assert ranker.salary_rub({"from": None, "to": None, "currency": "RUR"}) == 0.0
+
+
+def test_published_ts():
+    hh_format = ranker.published_ts("2025-01-12T10:00:00+0300")
+    assert hh_format == ranker.published_ts("2025-01-12T07:00:00Z")
+    assert hh_format == ranker.published_ts("2025-01-12T07:00:00+00:00")
+    assert ranker.published_ts("2025-01-13T10:00:00+0300") - hh_format == 86400
+    assert ranker.published_ts(None) == 0.0
+    assert ranker.published_ts("вчера") == 0.0
+
+
+def test_build_columns():
+    vacancies = [
+        {"_match_count": 2, "salary": {"from": 1000, "currency": "EUR"}, "published_at": "2025-01-12T10:00:00+0300"},
+        {},
+    ]
+    columns = ranker.build_columns(vacancies)
+    assert columns["score"] == [2, 0]
+    assert columns["salary"] == [1000 * ranker.CURRENCY_RATES["EUR"], 0.0]
+    assert columns["published"][0] > 0 and columns["published"][1] == 0.0
+
+
+def test_order_by_modes():
+    columns = columns_of(
+        scores=[1, 3, 3, 0],
+        salaries=[300000, 0, 150000, 200000],
+        published=[10.0, 30.0, 20.0, 0.0],
+    )
+    # При равном счёте сохраняется порядок выдачи hh.ru
+    assert ranker.order_by(columns, "match") == [1, 2, 0, 3]
+    assert ranker.order_by(columns, "salary") == [0, 3, 2, 1]
+    assert ranker.order_by(columns, "date") == [1, 2, 0, 3]
+    assert ranker.order_by(columns, "unknown") == ranker.order_by(columns, "match")
+    assert sorted(ranker.order_by(columns, "combined")) == [0, 1, 2, 3]
+
+
+def test_salary_ties_broken_by_score():
+    columns = columns_of(scores=[0, 2, 1], salaries=[100, 100, 100], published=[0.0, 0.0, 0.0])
+    assert ranker.order_by(columns, "salary") == [1, 2, 0]
+
+
+def test_top_k_matches_full_sort():
+    n = 200
+    columns = columns_of(
+        scores=[(i * 7) % 5 for i in range(n)],
+        salaries=[float((i * 37) % 11) * 10000 for i in range(n)],
+        published=[float((i * 13) % 17) for i in range(n)],
+    )
+    for mode in ranker.SORT_MODES:
+        full = ranker.order_by(columns, mode)
+        assert ranker.order_by(columns, mode, top_k=10) == full[:10]
+        assert ranker.order_by(columns, mode, top_k=n + 5) == full
+
+
+def test_order_by_empty():
+    assert ranker.order_by(columns_of([], [], []), "combined") == []
+    assert ranker.order_by(columns_of([], [], []), "match", top_k=5) == []
@@ -0,0 +1,51 @@
+import asyncio
+
+from core.stats import SpaceSaving, UsageStats
+
+
+def make_worker(tmp_path, worker_id):
+    return UsageStats(tmp_path / f"stats.worker{worker_id}.json", shards_glob=str(tmp_path / "stats.worker*.json"))
+
+
+def test_snapshot_sums_all_workers(tmp_path):
+    async def scenario():
+        first = make_worker(tmp_path, 0)
+        second = make_worker(tmp_path, 1)
+        first.incr("searches", 3)
+        first.observe("hh_search", 0.2)
+        first.add_skills(["Python", "Docker"])
+        second.incr("searches", 2)
+        second.observe("hh_search", 0.4)
+        second.add_skills(["python"])
+        await first.flush()
+        await second.flush()
+        await first.flush()
+        return first.snapshot, second.snapshot
+
+    first, second = asyncio.run(scenario())
+    for snapshot in (first, second):
+        assert snapshot["counters"]["searches"] == 5
+        assert snapshot["latency_ms"]["hh_search"]["count"] == 2
+        assert snapshot["top_skills"][0] == ("python", 2)
+
+
+def test_own_file_is_not_counted_twice(tmp_path):
+    async def scenario():
+        worker = make_worker(tmp_path, 0)
+        worker.incr("searches")
+        await worker.flush()
+        await worker.flush()
+        return worker.snapshot
+
+    assert asyncio.run(scenario())["counters"]["searches"] == 1
+
+
+def test_space_saving_merge_keeps_capacity():
+    left = SpaceSaving(capacity=2)
+    right = SpaceSaving(capacity=2)
+    left.add("a", 5)
+    left.add("b", 1)
+    right.add("c", 3)
+    right.add("a", 1)
+    left.merge(right)
+    assert left.top() == [("a", 6), ("c", 3)]
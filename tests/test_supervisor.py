@@ -0,0 +1,240 @@
+import itertools
+import queue
+from collections import Counter
+
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from bot import supervisor
+from bot.supervisor import HashRing, Supervisor, WorkerHandle, export_fsm, import_fsm
+
+_pids = itertools.count(1000)
+
+
+def test_ring_is_deterministic():
+    ring = HashRing(range(4))
+    other = HashRing(range(4))
+    assert all(ring.node_for(user) == other.node_for(user) for user in range(1000))
+
+
+def test_empty_ring():
+    assert HashRing().node_for(42) is None
+
+
+def test_ring_spreads_users_evenly():
+    ring = HashRing(range(4))
+    load = Counter(ring.node_for(user) for user in range(20000))
+    assert set(load) == {0, 1, 2, 3}
+    assert max(load.values()) < 1.3 * min(load.values())
+
+
+def test_adding_node_moves_only_its_share():
+    users = range(20000)
+    ring = HashRing(range(4))
+    before = {user: ring.node_for(user) for user in users}
+    ring.rebuild(range(5))
+    moved = [user for user in users if ring.node_for(user) != before[user]]
+    # Переезжают только пользователи нового узла, примерно 1/5
+    assert all(ring.node_for(user) == 4 for user in moved)
+    assert 0.12 < len(moved) / len(users) < 0.28
+
+
+def test_removing_node_keeps_other_users():
+    users = range(20000)
+    ring = HashRing(range(5))
+    before = {user: ring.node_for(user) for user in users}
+    ring.rebuild(range(4))
+    assert all(ring.node_for(user) == before[user] for user in users if before[user] != 4)
+
+
+class FakeProcess:
+    def __init__(self):
+        self.pid = next(_pids)
+        self.alive = True
+        self.exitcode = None
+
+    def is_alive(self):
+        return self.alive
+
+    def join(self, timeout=None):
+        pass
+
+    def terminate(self):
+        self.alive = False
+
+
+class FakeUpdate:
+    def __init__(self, update_id, user_id):
+        self.update_id = update_id
+        self.user_id = user_id
+
+    def model_dump_json(self, exclude_none=False):
+        return f'{{"update_id": {self.update_id}}}'
+
+
+def make_supervisor(monkeypatch, workers=1):
+    sup = Supervisor(workers, token="test")
+    sup.status = queue.Queue()
+    monkeypatch.setattr(sup, "_spawn", lambda worker_id, restarts=0: WorkerHandle(worker_id, FakeProcess(), queue.Queue()))
+    monkeypatch.setattr(supervisor, "update_user_key", lambda update: update.user_id)
+    sup.resize(workers)
+    return sup
+
+
+def drain(inbox):
+    items = []
+    while not inbox.empty():
+        items.append(inbox.get_nowait())
+    return items
+
+
+def crash(sup, worker_id):
+    handle = sup.workers[worker_id]
+    handle.process.alive = False
+    handle.process.exitcode = -9
+    handle.started_at -= supervisor.RESTART_BACKOFF_MAX
+    return handle
+
+
+def test_acked_updates_are_not_redelivered(monkeypatch):
+    sup = make_supervisor(monkeypatch)
+    for update_id in (1, 2, 3):
+        sup.dispatch(FakeUpdate(update_id, user_id=7))
+    old = sup.workers[0]
+    sup.status.put(("ack", 0, old.process.pid, 1))
+    sup.status.put(("ack", 0, old.process.pid, 2))
+    crash(sup, 0)
+    sup.check_health()
+    new = sup.workers[0]
+    assert new is not old
+    assert drain(new.inbox) == [("update", 7, '{"update_id": 3}')]
+    assert list(new.unacked) == [3]
+
+
+def test_updates_sent_to_dead_worker_are_redelivered_in_order(monkeypatch):
+    sup = make_supervisor(monkeypatch)
+    crash(sup, 0)
+    # Апдейты, пришедшие между падением и проверкой здоровья
+    for update_id in (10, 11):
+        sup.dispatch(FakeUpdate(update_id, user_id=7))
+    sup.check_health()
+    assert [raw for _, _, raw in drain(sup.workers[0].inbox)] == ['{"update_id": 10}', '{"update_id": 11}']
+
+
+def test_ack_from_previous_process_is_ignored(monkeypatch):
+    sup = make_supervisor(monkeypatch)
+    sup.dispatch(FakeUpdate(1, user_id=7))
+    stale_pid = sup.workers[0].process.pid
+    crash(sup, 0)
+    sup.check_health()
+    sup.status.put(("ack", 0, stale_pid + 12345, 1))
+    sup._drain_status()
+    assert list(sup.workers[0].unacked) == [1]
+
+
+def test_poison_update_is_dropped(monkeypatch):
+    sup = make_supervisor(monkeypatch)
+    sup.dispatch(FakeUpdate(1, user_id=7))
+    for _ in range(supervisor.MAX_REDELIVERIES + 1):
+        crash(sup, 0)
+        sup.check_health()
+    assert sup.workers[0].unacked == {}
+
+
+def test_retired_worker_leftovers_go_to_remaining_workers(monkeypatch):
+    sup = make_supervisor(monkeypatch, workers=2)
+    user = next(u for u in range(1000) if sup.ring.node_for(u) == 1)
+    sup.dispatch(FakeUpdate(5, user_id=user))
+    sup.resize(1)
+    retired = sup.retiring[0]
+    retired.process.alive = False
+    sup.check_health()
+    assert not sup.retiring
+    assert list(sup.workers[0].unacked) == [5]
+
+
+def moving_user(sup, workers):
+    """
+    Пользователь, который при переходе на workers воркеров переезжает
+    """
+    return next(u for u in range(1000) if HashRing(range(workers)).node_for(u) != sup.ring.node_for(u))
+
+
+def test_moved_user_updates_wait_for_fsm_handoff(monkeypatch):
+    sup = make_supervisor(monkeypatch, workers=2)
+    user = moving_user(sup, 3)
+    old = sup.workers[sup.ring.node_for(user)]
+    sup.dispatch(FakeUpdate(1, user_id=user))
+    sup.resize(3)
+    new = sup.workers[sup.ring.node_for(user)]
+    sup.dispatch(FakeUpdate(2, user_id=user))
+    sup.dispatch(FakeUpdate(3, user_id=user))
+    # Новому воркеру ничего не ушло, пока прежний не отдал пользователя
+    assert drain(new.inbox) == []
+    assert drain(old.inbox) == [("update", user, '{"update_id": 1}'), ("handoff", user, None)]
+
+    records = [({"bot_id": 1, "chat_id": user, "user_id": user}, "ResumeStates:editing_skills", {"user_skills": ["python"]})]
+    sup.status.put(("ack", old.worker_id, old.process.pid, 1))
+    sup.status.put(("handoff", old.worker_id, old.process.pid, (user, records)))
+    sup._drain_status()
+    assert drain(new.inbox) == [
+        ("fsm", user, records),
+        ("update", user, '{"update_id": 2}'),
+        ("update", user, '{"update_id": 3}'),
+    ]
+    assert sup.owners[user] is new
+    sup.dispatch(FakeUpdate(4, user_id=user))
+    assert drain(new.inbox) == [("update", user, '{"update_id": 4}')]
+
+
+def test_crash_of_previous_owner_keeps_update_order(monkeypatch):
+    sup = make_supervisor(monkeypatch, workers=2)
+    user = moving_user(sup, 3)
+    old_id = sup.ring.node_for(user)
+    sup.dispatch(FakeUpdate(1, user_id=user))
+    sup.resize(3)
+    sup.dispatch(FakeUpdate(2, user_id=user))
+    crash(sup, old_id)
+    sup.check_health()
+    new = sup.workers[sup.ring.node_for(user)]
+    # Неподтверждённый старый апдейт идёт раньше придержанного нового
+    assert [raw for _, _, raw in drain(new.inbox)] == ['{"update_id": 1}', '{"update_id": 2}']
+    assert not sup.held
+
+
+def test_retiring_worker_hands_over_fsm(monkeypatch):
+    sup = make_supervisor(monkeypatch, workers=2)
+    user = next(u for u in range(1000) if sup.ring.node_for(u) == 1)
+    sup.dispatch(FakeUpdate(1, user_id=user))
+    sup.resize(1)
+    retired = sup.retiring[0]
+    assert drain(retired.inbox)[-1] == ("retire", None, None)
+    sup.dispatch(FakeUpdate(2, user_id=user))
+    # Выводимый воркер больше не читает очередь, запрос FSM ему не шлётся
+    assert drain(retired.inbox) == []
+    sup.status.put(("ack", 1, retired.process.pid, 1))
+    sup.status.put(("handoff", 1, retired.process.pid, (user, [])))
+    retired.process.alive = False
+    sup.check_health()
+    assert drain(sup.workers[0].inbox) == [("fsm", user, []), ("update", user, '{"update_id": 2}')]
+    assert not sup.retiring
+
+
+def test_fsm_export_and_import():
+    old, new = MemoryStorage(), MemoryStorage()
+    key = StorageKey(bot_id=1, chat_id=7, user_id=7)
+    other = StorageKey(bot_id=1, chat_id=8, user_id=8)
+    old.storage[key].state = "ResumeStates:editing_skills"
+    old.storage[key].data = {"user_skills": ["python"]}
+    old.storage[other].data = {"user_skills": ["go"]}
+    # Устаревший FSM с прошлого пребывания пользователя на новом воркере
+    new.storage[key].data = {"user_skills": ["cobol"]}
+
+    records = export_fsm(old, 7)
+    assert key not in old.storage and other in old.storage
+    import_fsm(new, 7, records)
+    assert new.storage[key].state == "ResumeStates:editing_skills"
+    assert new.storage[key].data == {"user_skills": ["python"]}
+
+    import_fsm(new, 7, [])
+    assert key not in new.storage